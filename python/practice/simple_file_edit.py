@@ -1,5 +1,5 @@
 import os
-import re
+import sys
 from datetime import datetime
 
 # Optional: Pillow library for reading EXIF metadata from images
@@ -10,6 +10,47 @@ except ImportError:
     Image = None
     print("PIL not found. EXIF parsing skipped. Install with 'pip install pillow' for best results.")
 
+# Helpers shared with projects/mod_date_to_filename: the persistent metadata
+# cache (optional, unchanged files are not opened again on the next run) and
+# the filename date patterns
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "projects", "mod_date_to_filename"))
+try:
+    from media_cache import open_cache
+except ImportError:
+    open_cache = None
+
+# Shared filename date patterns, with the ambiguous US/EU day orders added
+from filename_dates import DatePatternSet, DEFAULT_PATTERNS, AMBIGUOUS_PATTERNS
+FILENAME_DATES = DatePatternSet(DEFAULT_PATTERNS + AMBIGUOUS_PATTERNS)
+
+metadata_cache = None  # opened in main()
+
+def get_exif_timestamp(file_path):
+    """
+    Reads the EXIF date with Pillow.
+    Returns (datetime, "PIL EXIF"), or (None, None) when there is none.
+    """
+    try:
+        with Image.open(file_path) as img:  # Open image without loading full data into memory
+            exif = img.getexif()  # Get EXIF data dictionary
+            if exif:
+                # Common EXIF tags for date:
+                # 36867 = DateTimeOriginal (preferred)
+                # 36868 = DateTimeDigitized
+                # 306   = DateTime (fallback, when file was modified in camera)
+                date_str = exif.get(36867) or exif.get(36868) or exif.get(306)
+                if date_str:
+                    # Clean string: remove timezone info (+00:00 or Z), trim whitespace
+                    date_str = date_str.split('+')[0].split('Z')[0].strip()
+                    # EXIF uses colons in date: '2025:12:31 23:59:59' → replace first two with spaces
+                    date_str = date_str.replace(':', ' ', 2)
+                    return datetime.strptime(date_str, '%Y %m %d %H %M %S'), "PIL EXIF"
+    except Exception:
+        # Many file types (e.g. PNG, some videos) don't have EXIF or cause errors → silently ignore
+        pass
+    return None, None
+
 def get_timestamp(file_path):
     """
     Attempts to extract the original photo/video timestamp.
@@ -22,81 +63,21 @@ def get_timestamp(file_path):
 
     # ==================== 1. EXIF METADATA PARSING ====================
     if Image:  # Only attempt if Pillow is available
-        try:
-            with Image.open(file_path) as img:  # Open image without loading full data into memory
-                exif = img.getexif()  # Get EXIF data dictionary
-                if exif:
-                    # Common EXIF tags for date:
-                    # 36867 = DateTimeOriginal (preferred)
-                    # 36868 = DateTimeDigitized
-                    # 306   = DateTime (fallback, when file was modified in camera)
-                    date_str = exif.get(36867) or exif.get(36868) or exif.get(306)
-                    if date_str:
-                        # Clean string: remove timezone info (+00:00 or Z), trim whitespace
-                        date_str = date_str.split('+')[0].split('Z')[0].strip()
-                        # EXIF uses colons in date: '2025:12:31 23:59:59' → replace first two with spaces
-                        date_str = date_str.replace(':', ' ', 2)
-                        return datetime.strptime(date_str, '%Y %m %d %H %M %S')
-        except Exception:
-            # Many file types (e.g. PNG, some videos) don't have EXIF or cause errors → silently ignore
-            pass
+        if metadata_cache:
+            # Reuse the date found on an earlier run if the file is unchanged
+            ts, _ = metadata_cache.cached_date(file_path, get_exif_timestamp,
+                                               kind="pil_exif_date")
+        else:
+            ts, _ = get_exif_timestamp(file_path)
+        if ts:
+            return ts
 
     # ==================== 2. FILENAME PATTERN PARSING ====================
-    # Remove common prefixes that don't contain date info (e.g., "IMG_", "Screenshot_")
-    clean_name = re.sub(r'^(img|vid|photo|picture|pxl|screenshot|snapchat|fb.?img)[- _]*', '', filename)
-    # Remove common suffixes like WhatsApp's "-WA0001"
-    clean_name = re.sub(r'[- _](wa|burst)\d*$', '', clean_name)
-
-    # Pattern 1: Most common phone format → YYYYMMDD[HHMMSS]
-    # Examples: IMG_20251231_235959.jpg, 20251231.jpg
-    match = re.search(r'(\d{8})(\d{6})?', clean_name)
-    if match:
-        date_part = match.group(1)           # YYYYMMDD
-        time_part = match.group(2) or '000000'  # HHMMSS or default midnight
-        try:
-            return datetime.strptime(date_part + time_part, '%Y%m%d%H%M%S')
-        except ValueError:
-            pass  # Invalid date → continue to next pattern
-
-    # Pattern 2: Explicit date with separators → YYYY-MM-DD [HH-MM-SS]
-    # Handles -, _, ., space as separators
-    match = re.search(r'(\d{4})[-_\. ]?(\d{2})[-_\. ]?(\d{2})[-_\. ]?(\d{2})?[-_\. ]?(\d{2})?[-_\. ]?(\d{2})?', clean_name)
-    if match:
-        y, m, d = match.group(1), match.group(2), match.group(3)
-        h = match.group(4) or '00'   # Default to 00 if time missing
-        mi = match.group(5) or '00'
-        s = match.group(6) or '00'
-        try:
-            return datetime(int(y), int(m), int(d), int(h), int(mi), int(s))
-        except ValueError:
-            pass
-
-    # Pattern 3: 13-digit Unix timestamp in milliseconds
-    # Common in Snapchat, Facebook downloads, etc.
-    match = re.search(r'(\d{13})', filename)
-    if match:
-        try:
-            timestamp_ms = int(match.group(1))
-            return datetime.fromtimestamp(timestamp_ms / 1000.0)
-        except (ValueError, OSError):
-            pass
-
-    # Pattern 4: Ambiguous US/EU formats → MMDDYYYY or DDMMYYYY with optional time
-    match = re.search(r'(\d{2})(\d{2})(\d{4})(\d{6})?', clean_name)
-    if match:
-        a, b, y = int(match.group(1)), int(match.group(2)), int(match.group(3))
-        time_part = match.group(4) or '000000'
-        h, mi, s = int(time_part[:2]), int(time_part[2:4]), int(time_part[4:])
-        # Try MM/DD/YYYY first
-        try:
-            return datetime(y, a, b, h, mi, s)
-        except ValueError:
-            pass
-        # Then try DD/MM/YYYY
-        try:
-            return datetime(y, b, a, h, mi, s)
-        except ValueError:
-            pass
+    # One compiled pass over all known camera/phone/WhatsApp/Snapchat/epoch-ms
+    # patterns, plus MMDDYYYY / DDMMYYYY (see filename_dates.py)
+    ts, _ = FILENAME_DATES.parse(os.path.splitext(filename)[0])
+    if ts:
+        return ts
 
     # If no pattern matched → return None (file will not be renamed)
     return None
@@ -182,9 +163,17 @@ def main():
     else:
         print("\n--- LIVE MODE (files will be renamed) ---\n")
 
+    # Open the shared metadata cache (skipped if media_cache.py is not found)
+    global metadata_cache
+    if Image and open_cache:
+        metadata_cache = open_cache()
+
     # Process all files and get summary counts
     renamed, skipped = process_directory(dir_path, dry_run)
 
+    if metadata_cache:
+        metadata_cache.close()
+
     # Final summary
     print(f"\nDone! {renamed} files renamed, {skipped} not changed or skipped.")
 
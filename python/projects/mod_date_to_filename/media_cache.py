@@ -0,0 +1,216 @@
+"""
+Persistent SQLite cache of metadata extracted from media files.
+
+Entries are keyed by the file's identity (device + inode, or the path when
+the filesystem has no inode numbers, as on some SMB shares) and are only
+used while size and mtime still match, so a re-scan of an archive that has
+hardly changed reads almost nothing but directory listings. Each extractor
+stores its results under its own kind, e.g. "capture_date".
+
+Shared by test6.py and practice/simple_file_edit.py.
+
+Usage:
+    with MetadataCache() as cache:
+        dt, source = cache.cached_date(path, get_media_creation_date)
+
+    python media_cache.py stats
+    python media_cache.py invalidate //tank/photo/2023     # or everything
+    python media_cache.py prune                            # gone / changed
+    python media_cache.py vacuum
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+# ----------------------------- CONFIGURATION -----------------------------
+DEFAULT_CACHE_PATH = os.environ.get("MEDIA_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "media_meta", "cache.sqlite")
+COMMIT_EVERY = 500   # new entries written per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    file TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    value TEXT,
+    source TEXT,
+    checked REAL NOT NULL,
+    PRIMARY KEY (file, kind)
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (path);
+"""
+
+
+def file_key(path, st):
+    """Identity of a file that survives renames where the OS allows it."""
+    if not st.st_ino:
+        # DirEntry.stat() on Windows leaves st_ino 0, os.stat() fills it in
+        try:
+            st = os.stat(path)
+        except OSError:
+            pass
+    if st.st_ino:
+        return f"{st.st_dev}:{st.st_ino}"
+    return "path:" + os.path.normcase(os.path.abspath(path))
+
+
+class MetadataCache:
+    """Extracted metadata by file, valid while size and mtime are unchanged."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.hits = self.misses = 0
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    # ----------------------------- lookups -----------------------------
+    def get(self, path, kind, st=None):
+        """(True, value, source) for a valid entry, else (False, None, None)."""
+        st = st or os.stat(path)
+        row = self.db.execute(
+            "SELECT size, mtime_ns, value, source FROM entries "
+            "WHERE file = ? AND kind = ?", (file_key(path, st), kind)).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            self.misses += 1
+            return False, None, None
+        self.hits += 1
+        value = json.loads(row[2]) if row[2] is not None else None
+        return True, value, row[3]
+
+    def put(self, path, kind, value, source=None, st=None):
+        """Store a JSON-serialisable value (None too: 'nothing found')."""
+        st = st or os.stat(path)
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(file, kind, path, size, mtime_ns, value, source, checked) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_key(path, st), kind, os.path.abspath(path), st.st_size,
+             st.st_mtime_ns, None if value is None else json.dumps(value),
+             source, time.time()))
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.db.commit()
+            self._pending = 0
+
+    def get_date(self, path, kind="capture_date", st=None):
+        """(found, datetime or None, source) like get, for stored dates."""
+        found, value, source = self.get(path, kind, st)
+        return found, (datetime.fromisoformat(value) if value else None), source
+
+    def put_date(self, path, dt, source, kind="capture_date", st=None):
+        self.put(path, kind, dt.isoformat() if dt else None, source, st)
+
+    def cached_date(self, path, extract, kind="capture_date"):
+        """
+        extract(path) -> (datetime or None, source), answered from the cache
+        when the file has not changed since it was last extracted.
+        """
+        path = str(path)
+        st = os.stat(path)
+        found, dt, source = self.get_date(path, kind, st)
+        if not found:
+            dt, source = extract(path)
+            self.put_date(path, dt, source, kind, st)
+        return dt, source
+
+    # ----------------------------- maintenance -----------------------------
+    def invalidate(self, prefix=None, kind=None):
+        """Drop entries below a path prefix and/or of one kind, or all."""
+        where, args = [], []
+        if prefix:
+            where.append("substr(path, 1, ?) = ?")
+            prefix = os.path.abspath(prefix)
+            args += [len(prefix), prefix]
+        if kind:
+            where.append("kind = ?")
+            args.append(kind)
+        sql = "DELETE FROM entries"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.db:
+            return self.db.execute(sql, args).rowcount
+
+    def prune(self):
+        """Drop entries of files that are gone or have changed."""
+        stale = []
+        for file, path, size, mtime_ns in self.db.execute(
+                "SELECT DISTINCT file, path, size, mtime_ns FROM entries"):
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append((file,))
+                continue
+            if file_key(path, st) != file or st.st_size != size or \
+                    st.st_mtime_ns != mtime_ns:
+                stale.append((file,))
+        with self.db:
+            self.db.executemany("DELETE FROM entries WHERE file = ?", stale)
+        return len(stale)
+
+    def vacuum(self):
+        self.db.commit()
+        self.db.execute("VACUUM")
+
+    def stats(self):
+        """{kind: number of entries}"""
+        return dict(self.db.execute(
+            "SELECT kind, COUNT(*) FROM entries GROUP BY kind ORDER BY kind"))
+
+
+def open_cache(path=DEFAULT_CACHE_PATH):
+    """A MetadataCache, or None (with a warning) if it cannot be opened."""
+    try:
+        return MetadataCache(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Metadata cache disabled ({path}): {e}")
+        return None
+
+
+# ----------------------------- MAIN -----------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Maintain the media metadata cache")
+    parser.add_argument("--db", default=DEFAULT_CACHE_PATH,
+                        help=f"cache file (default {DEFAULT_CACHE_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="entries per kind")
+    inv = sub.add_parser("invalidate", help="drop cached entries")
+    inv.add_argument("prefix", nargs="?", help="only files below this path")
+    inv.add_argument("--kind", help="only entries of this kind")
+    sub.add_parser("prune", help="drop entries of missing or changed files")
+    sub.add_parser("vacuum", help="compact the cache file")
+    args = parser.parse_args()
+
+    with MetadataCache(args.db) as cache:
+        if args.command == "stats":
+            for kind, count in cache.stats().items():
+                print(f"{kind:<20} {count:>9}")
+            print(f"{os.path.getsize(args.db) / 1e6:.1f} MB in {args.db}")
+        elif args.command == "invalidate":
+            print(f"Removed {cache.invalidate(args.prefix, args.kind)} entries")
+        elif args.command == "prune":
+            print(f"Removed {cache.prune()} stale entries")
+        elif args.command == "vacuum":
+            cache.vacuum()
+            print(f"{os.path.getsize(args.db) / 1e6:.1f} MB in {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Read the capture date of a photo or video from its header only.
+
+Every file is opened once and only the first HEADER_WINDOW bytes are read,
+plus a few small seeks for JPEG segments, WebP chunks and MP4/MOV/HEIC
+boxes that sit further in. No third-party libraries are needed. Understood:
+
+    JPEG        EXIF in the APP1 segment
+    TIFF / RAW  IFD0 and the EXIF IFD (TIFF, CR2, NEF, ARW, DNG, ORF, RW2)
+    PNG, WebP   eXIf / EXIF chunk
+    HEIC/HEIF   the Exif item of the meta box
+    MP4/MOV/3GP creation time of moov/mvhd
+
+Usage:
+    from media_meta import read_capture_date, NO_DATE
+    dt, source = read_capture_date("IMG_1234.HEIC")
+    # (None, NO_DATE): no date in the file, (None, None): not understood,
+    # worth asking the slower libraries
+
+    python media_meta.py photo.jpg clip.mp4
+"""
+import struct
+import sys
+from datetime import datetime, timedelta
+
+# ----------------------------- CONFIGURATION -----------------------------
+HEADER_WINDOW = 256 * 1024   # bytes read from the start of every file
+MAX_BOXES = 64               # top-level boxes, segments or chunks looked at
+
+# Extensions whose dates read_capture_date can find; other files are left
+# to the slower library based extractors
+HEADER_EXTS = {
+    ".jpg", ".jpeg", ".tif", ".tiff", ".png", ".webp", ".heic", ".heif",
+    ".arw", ".cr2", ".nef", ".orf", ".rw2", ".dng",
+    ".mp4", ".mov", ".m4v", ".3gp",
+}
+
+# EXIF tags, in order of preference
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_CREATE_DATE = 0x9004   # DateTimeDigitized
+
+MP4_EPOCH = datetime(1904, 1, 1)
+
+NO_DATE = "no date"   # source of files that were understood but are dateless
+
+
+class _Unsupported(ValueError):
+    """the file is laid out in a way this reader does not follow"""
+
+
+# ----------------------------- EXIF / TIFF -----------------------------
+def _parse_exif_date(value):
+    """'YYYY:MM:DD HH:MM:SS' as datetime, None for blank or broken dates."""
+    value = value.split(b"\x00", 1)[0].strip().decode("ascii", "replace")
+    if len(value) < 19 or value.startswith("0000"):
+        return None
+    value = value[:19].replace(":", "-", 2)
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _read_ifd(data, offset, endian):
+    """
+    {tag: raw value} of the ASCII and LONG entries of one IFD, which must
+    lie within data.
+    """
+    entries = {}
+    if offset + 2 > len(data):
+        raise _Unsupported("IFD outside the bytes read")
+    count = struct.unpack_from(endian + "H", data, offset)[0]
+    pos = offset + 2
+    for _ in range(count):
+        if pos + 12 > len(data):
+            raise _Unsupported("IFD outside the bytes read")
+        tag, kind, num, value = struct.unpack_from(endian + "HHII", data, pos)
+        pos += 12
+        if kind == 2:       # ASCII, stored inline when it fits in 4 bytes
+            start = pos - 4 if num <= 4 else value
+            if start + num > len(data):
+                raise _Unsupported("EXIF value outside the bytes read")
+            entries[tag] = data[start:start + num]
+        elif kind in (4, 13):   # LONG, IFD
+            entries[tag] = value
+    return entries
+
+
+def date_from_tiff(data):
+    """
+    (datetime, tag name) from a TIFF structure starting at data[0], raises
+    ValueError if its IFDs are not all in data.
+    """
+    if data[:2] == b"II":
+        endian = "<"
+    elif data[:2] == b"MM":
+        endian = ">"
+    else:
+        return None, None
+    if len(data) < 8:
+        return None, None
+
+    ifd0 = _read_ifd(data, struct.unpack_from(endian + "I", data, 4)[0],
+                     endian)
+    exif = {}
+    if isinstance(ifd0.get(TAG_EXIF_IFD), int):
+        exif = _read_ifd(data, ifd0[TAG_EXIF_IFD], endian)
+
+    for tags, tag, name in ((exif, TAG_DATETIME_ORIGINAL, "DateTimeOriginal"),
+                            (exif, TAG_CREATE_DATE, "CreateDate"),
+                            (ifd0, TAG_DATETIME, "DateTime")):
+        value = tags.get(tag)
+        if isinstance(value, bytes):
+            dt = _parse_exif_date(value)
+            if dt:
+                return dt, name
+    return None, None
+
+
+def _date_from_exif_block(block, source):
+    """EXIF payload that may start with 'Exif\\0\\0' before the TIFF header."""
+    if block.startswith(b"Exif\x00\x00"):
+        block = block[6:]
+    dt, tag = date_from_tiff(block)
+    return (dt, f"{source} {tag}") if dt else (None, None)
+
+
+# ----------------------------- CONTAINERS -----------------------------
+def _date_from_jpeg(read):
+    pos = 2
+    for _ in range(MAX_BOXES):
+        header = read(pos, 4)
+        if len(header) < 4 or header[0] != 0xFF:
+            raise _Unsupported("JPEG segments end before the image data")
+        marker = header[1]
+        if marker == 0xDA:     # start of scan, no metadata after this
+            return None, None
+        length = struct.unpack_from(">H", header, 2)[0]
+        if marker == 0xE1:
+            segment = read(pos + 4, length - 2)
+            if segment.startswith(b"Exif\x00\x00"):
+                return _date_from_exif_block(segment, "JPEG EXIF")
+        pos += 2 + length
+    raise _Unsupported("too many JPEG segments")
+
+
+def _date_from_png(head):
+    pos = 8
+    while pos + 8 <= len(head):
+        length, kind = struct.unpack_from(">I4s", head, pos)
+        if kind == b"eXIf":
+            return _date_from_exif_block(head[pos + 8:pos + 8 + length],
+                                         "PNG EXIF")
+        # eXIf has to come before the image data
+        if kind in (b"IDAT", b"IEND"):
+            return None, None
+        pos += 12 + length
+    raise _Unsupported("PNG chunks go on past the bytes read")
+
+
+def _date_from_webp(read, size):
+    # the EXIF chunk usually follows the image data, chunks are few
+    end = min(size, 8 + struct.unpack_from("<I", read(4, 4))[0])
+    pos = 12
+    for _ in range(MAX_BOXES):
+        if pos + 8 > end:
+            return None, None
+        kind, length = struct.unpack_from("<4sI", read(pos, 8))
+        if kind == b"EXIF":
+            return _date_from_exif_block(read(pos + 8, length), "WebP EXIF")
+        pos += 8 + length + (length & 1)
+    raise _Unsupported("too many WebP chunks")
+
+
+def _boxes(read, start, end, limit=MAX_BOXES):
+    """(type, payload start, payload end) of the ISO BMFF boxes in a range."""
+    pos = start
+    for _ in range(limit):
+        if pos + 8 > end:
+            return
+        header = read(pos, 16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack_from(">I4s", header)
+        body = pos + 8
+        if size == 1 and len(header) >= 16:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            body = pos + 16
+        elif size == 0:
+            size = end - pos
+        if size < body - pos:
+            return
+        yield kind, body, min(pos + size, end)
+        pos += size
+
+
+def _date_from_mvhd(data):
+    version = data[0]
+    if version == 1:
+        seconds = struct.unpack_from(">Q", data, 4)[0]
+    else:
+        seconds = struct.unpack_from(">I", data, 4)[0]
+    if not seconds:
+        return None, None
+    # mvhd times are UTC, like the dates hachoir reports
+    return MP4_EPOCH + timedelta(seconds=seconds), "MP4 mvhd"
+
+
+def _heic_exif_location(read, start, end):
+    """
+    (offset, length) in the file of the Exif item of a HEIF meta box, None
+    if there is none. The item may be stored in the file or in the idat
+    box of the meta box, other constructions raise ValueError.
+    """
+    exif_id = None
+    idat = None
+    locations = {}
+    for kind, body, stop in _boxes(read, start + 4, end):   # full box
+        if kind == b"idat":
+            idat = body
+        if kind not in (b"iinf", b"iloc"):
+            continue
+        data = read(body, stop - body)
+        if kind == b"iinf":
+            version = data[0]
+            count_size = 2 if version == 0 else 4
+            count = int.from_bytes(data[4:4 + count_size], "big")
+            for infe_kind, ibody, _ in _boxes(
+                    lambda off, size: data[off:off + size], 4 + count_size,
+                    len(data), count):
+                if infe_kind != b"infe" or data[ibody] < 2:
+                    continue
+                if data[ibody] == 2:
+                    item_id = struct.unpack_from(">H", data, ibody + 4)[0]
+                    item_type = data[ibody + 8:ibody + 12]
+                else:
+                    item_id = struct.unpack_from(">I", data, ibody + 4)[0]
+                    item_type = data[ibody + 10:ibody + 14]
+                if item_type == b"Exif":
+                    exif_id = item_id
+        elif kind == b"iloc":
+            version = data[0]
+            offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+            base_size = data[5] >> 4
+            index_size = data[5] & 0x0F if version in (1, 2) else 0
+            pos = 6
+            if version < 2:
+                count = struct.unpack_from(">H", data, pos)[0]
+                pos += 2
+            else:
+                count = struct.unpack_from(">I", data, pos)[0]
+                pos += 4
+
+            def number(size):
+                nonlocal pos
+                value = int.from_bytes(data[pos:pos + size], "big")
+                pos += size
+                return value
+
+            for _ in range(count):
+                item_id = number(2 if version < 2 else 4)
+                method = number(2) & 0x0F if version in (1, 2) else 0
+                pos += 2       # data reference index
+                base = number(base_size)
+                extents = number(2)
+                for idx in range(extents):
+                    number(index_size)
+                    offset = number(offset_size)
+                    length = number(length_size)
+                    if idx == 0:
+                        locations[item_id] = (method, base + offset, length,
+                                              extents)
+    if exif_id is None:
+        return None
+    if exif_id not in locations:
+        raise _Unsupported("HEIF Exif item without a location")
+    method, offset, length, extents = locations[exif_id]
+    if extents != 1:
+        raise _Unsupported("HEIF Exif item in several extents")
+    if method == 0:     # file offset
+        return offset, length
+    if method == 1 and idat is not None:   # offset in the idat box
+        return idat + offset, length
+    raise _Unsupported(f"HEIF construction method {method}")
+
+
+def _date_from_isobmff(read, size):
+    """
+    the mvhd creation time or the HEIC Exif date. A zero creation time or
+    no moov and Exif within MAX_BOXES boxes raise ValueError, the libraries
+    look at more than these.
+    """
+    exif_read = False
+    for kind, body, stop in _boxes(read, 0, size):
+        if kind == b"moov":
+            for sub, sbody, sstop in _boxes(read, body, stop):
+                if sub == b"mvhd":
+                    dt, source = _date_from_mvhd(read(sbody, 12))
+                    if dt:
+                        return dt, source
+                    break
+        elif kind == b"meta":
+            location = _heic_exif_location(read, body, stop)
+            if location:
+                offset, length = location
+                block = read(offset, min(length, HEADER_WINDOW))
+                # the Exif item starts with the offset of the TIFF header
+                skip = 4 + struct.unpack_from(">I", block)[0] \
+                    if len(block) >= 4 else 0
+                dt, source = _date_from_exif_block(block[skip:], "HEIC EXIF")
+                if dt:
+                    return dt, source
+                exif_read = True
+    if exif_read:
+        return None, None
+    raise _Unsupported("no creation time in the boxes read")
+
+
+# ----------------------------- ENTRY POINT -----------------------------
+def read_capture_date(file_path):
+    """
+    (datetime, source) of a media file from its header, (None, NO_DATE)
+    when the file was understood and carries no date, (None, None) when
+    its format or layout is not understood.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(HEADER_WINDOW)
+
+        def read(offset, size):
+            if offset + size <= len(head):
+                return head[offset:offset + size]
+            f.seek(offset)
+            return f.read(size)
+
+        try:
+            if head.startswith(b"\xff\xd8"):
+                dt, source = _date_from_jpeg(read)
+            elif head[:2] in (b"II", b"MM"):
+                dt, tag = date_from_tiff(head)
+                source = f"TIFF {tag}"
+            elif head.startswith(b"\x89PNG\r\n\x1a\n"):
+                dt, source = _date_from_png(head)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                f.seek(0, 2)
+                dt, source = _date_from_webp(read, f.tell())
+            elif head[4:8] == b"ftyp":
+                f.seek(0, 2)
+                dt, source = _date_from_isobmff(read, f.tell())
+            else:
+                return None, None
+        except (struct.error, IndexError, ValueError, OverflowError):
+            # OverflowError: times too far out for datetime, broken files
+            return None, None
+    return (dt, source) if dt else (None, NO_DATE)
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        dt, source = read_capture_date(name)
+        print(f"{name}: {dt or '-'}  ({source or 'not understood'})")
@@ -12,6 +12,12 @@ try:
 except ImportError:
     TKINTER_AVAILABLE = False
 
+# Shared scandir walker from this folder (falls back to Path.rglob)
+try:
+    from media_walk import walk_media
+except ImportError:
+    walk_media = None
+
 
 def select_folder_graphically():
     """Open a graphical folder picker dialog."""
@@ -48,10 +54,13 @@ def batch_rename_media(root_dir, execute=False):
 
     print(f"Scanning: {root_path.resolve()}\n")
 
-    for file_path in root_path.rglob('*'):  # Recursively find all files
-        if not file_path.is_file():
-            continue
-        
+    if walk_media:
+        # Lazily yields media files only, skipping recycle bins and NAS thumbnail folders
+        candidates = (Path(entry.path) for entry in walk_media(root_path, media_extensions))
+    else:
+        candidates = (f for f in root_path.rglob('*') if f.is_file())  # Recursively find all files
+
+    for file_path in candidates:
         filename = file_path.name
         match = pattern.match(filename)
         if not match:
@@ -1,5 +1,5 @@
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
@@ -8,6 +8,9 @@ directory = "//tank/photo/2023/2023-01-15"  # Change to your folder
 recursive = True          # Now safer to enable
 dry_run = True            # Set to False to actually rename
 use_metadata = True       # Highly recommended
+use_cache = True          # Remember extracted dates between runs (media_cache.py)
+workers = 8               # Files read at once (1 = one after another)
+use_processes = False     # Threads suit NAS I/O; processes help slow parsers
 
 # Supported extensions
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".heif", ".tif", ".tiff", ".webp", ".bmp", ".gif"}
@@ -18,9 +21,10 @@ SUPPORTED_EXTS = IMAGE_EXTS.union(VIDEO_EXTS)
 try:
     from PIL import Image
     from PIL.ExifTags import TAGS as PIL_TAGS
+    PIL_TAG_IDS = {v: k for k, v in PIL_TAGS.items()}
 except ImportError:
     Image = None
-    PIL_TAGS = None
+    PIL_TAGS = PIL_TAG_IDS = None
 
 try:
     import exifread
@@ -33,6 +37,27 @@ try:
 except ImportError:
     extractMetadata = createParser = None
 
+# Filename date patterns, compiled once (filename_dates.py in this folder)
+from filename_dates import parse_filename_date
+
+# Header-only reader from this folder: one open per file, no libraries
+try:
+    from media_meta import read_capture_date, HEADER_EXTS, NO_DATE
+except ImportError:
+    read_capture_date = None
+    HEADER_EXTS = set()
+    NO_DATE = None
+
+try:
+    from media_cache import open_cache
+except ImportError:
+    open_cache = None
+
+try:
+    from media_walk import walk_media
+except ImportError:
+    walk_media = None
+
 # ----------------------------- HELPERS -----------------------------
 def get_media_creation_date(file_path):
     """Best effort to extract creation date from metadata."""
@@ -41,6 +66,20 @@ def get_media_creation_date(file_path):
 
     str_path = str(file_path)
 
+    # 0. Header-only reader: JPEG, TIFF/RAW, PNG, WebP, HEIC and MP4/MOV
+    #    are read once, only their first few hundred KB; the libraries
+    #    below are left for other formats and for files it could not
+    #    make sense of
+    if read_capture_date and Path(str_path).suffix.lower() in HEADER_EXTS:
+        try:
+            dt, source = read_capture_date(str_path)
+            if dt:
+                return dt, source
+            if source == NO_DATE:
+                return None, None
+        except OSError:
+            pass
+
     # 1. Pillow (good for JPEG, HEIC, some MOV)
     if Image and PIL_TAGS:
         try:
@@ -48,7 +87,7 @@ def get_media_creation_date(file_path):
                 exif = img.getexif()
                 if exif:
                     for tag_name in ["DateTimeOriginal", "DateTime", "CreateDate", "MediaCreateDate"]:
-                        tag_id = {v: k for k, v in PIL_TAGS.items()}.get(tag_name)
+                        tag_id = PIL_TAG_IDS.get(tag_name)
                         if tag_id and tag_id in exif:
                             value = exif[tag_id]
                             if isinstance(value, str):
@@ -108,51 +147,70 @@ def get_media_creation_date(file_path):
 
     return None, None
 
-def get_file_creation_date(file_path):
-    """Fallback: filesystem birth/creation time."""
+def get_file_creation_date(file_path, st=None):
+    """Fallback: filesystem birth/creation time (st: stat result, if known)."""
+    st = st or file_path.stat()
     try:
-        timestamp = file_path.stat().st_birthtime  # macOS preferred
+        timestamp = st.st_birthtime  # macOS preferred
     except AttributeError:
-        timestamp = file_path.stat().st_ctime      # Windows fallback
+        timestamp = st.st_ctime      # Windows fallback
     return datetime.fromtimestamp(timestamp), "filesystem"
 
 def parse_date_from_filename(stem):
-    """Extended patterns for common phone/camera naming."""
-    text = stem.upper()
-
-    patterns = [
-        (r"(\d{8}[_T]?\d{6})", "%Y%m%d%H%M%S"),
-        (r"(\d{8}[_]\d{6})", "%Y%m%d_%H%M%S"),
-        (r"(\d{4}-\d{2}-\d{2}[_ ]\d{2}[_.-]?\d{2}[_.-]?\d{2})", "%Y-%m-%d %H:%M:%S"),
-        (r"(\d{4}\d{2}\d{2}[_T]?\d{6})", "%Y%m%d%H%M%S"),
-        (r"IMG[_-](\d{8})[_-]?\d+", "%Y%m%d"),
-        (r"PXL[_-](\d{8})[_-]?\d+", "%Y%m%d"),
-        (r"VID[_-](\d{8})[_-]?\d+", "%Y%m%d"),
-        (r"VIDEO[_-](\d{8})", "%Y%m%d"),
-        (r"(\d{4}-\d{2}-\d{2})", "%Y-%m-%d"),
-        (r"(\d{4}\d{2}\d{2})", "%Y%m%d"),
-        (r"VID-(\d{8})-WA\d+", "%Y%m%d"),           # WhatsApp
-        (r"IMG-(\d{8})-WA\d+", "%Y%m%d"),
-        (r"SNAPCHAT-\d+-(\d{8})", "%Y%m%d"),
-        (r"MOV_\d+_(\d{8})", "%Y%m%d"),
-    ]
-
-    for regex, fmt in patterns:
-        match = re.search(regex, text)
-        if match:
-            date_str = re.sub(r"[^\d]", "", match.group(1))
-            try:
-                if len(date_str) == 8:
-                    return datetime.strptime(date_str, "%Y%m%d"), "filename"
-                elif len(date_str) == 14:
-                    return datetime.strptime(date_str, "%Y%m%d%H%M%S"), "filename"
-            except ValueError:
-                continue
+    """Camera/phone/WhatsApp/... date in the name, see filename_dates.py."""
+    dt, _ = parse_filename_date(stem)
+    if dt:
+        return dt, "filename"
     return None, None
 
 def generate_new_name(dt, extension):
     return dt.strftime("%Y-%m-%d-%Hh%Mm%Ss") + extension.lower()
 
+def find_files(path):
+    """{Path: os.DirEntry, or None without the walker} of the supported files below path."""
+    if walk_media:
+        # one directory listing per folder, extension checked first
+        entries = walk_media(path, SUPPORTED_EXTS, recursive)
+        return {Path(e.path): e for e in entries}
+    glob_method = path.rglob if recursive else path.glob
+    return {f: None for f in glob_method("*") if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS}
+
+def file_stat(files, file_path):
+    """Stat of a file, taken from its DirEntry when the walker found it."""
+    entry = files.get(file_path)
+    return entry.stat() if entry is not None else file_path.stat()
+
+def extract_all_dates(files, cache=None):
+    """
+    Phase 1: metadata date of every file, {path: (dt, source)}.
+    Cached dates are looked up first, the rest is read by a pool of
+    `workers` threads (or processes) so NAS round trips overlap.
+    """
+    results = {}
+    todo = []
+    for file_path in files:
+        found = False
+        if cache:
+            found, dt, source = cache.get_date(str(file_path), st=file_stat(files, file_path))
+        if found:
+            results[file_path] = (dt, source)
+        else:
+            todo.append(file_path)
+
+    if workers > 1 and len(todo) > 1:
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            dates = pool.map(get_media_creation_date, todo, chunksize=16 if use_processes else 1)
+            results.update(zip(todo, dates))
+    else:
+        results.update((f, get_media_creation_date(f)) for f in todo)
+
+    if cache:
+        for file_path in todo:
+            dt, source = results[file_path]
+            cache.put_date(str(file_path), dt, source, st=file_stat(files, file_path))
+    return results
+
 # ----------------------------- MAIN -----------------------------
 def main():
     path = Path(directory)
@@ -160,8 +218,7 @@ def main():
         print(f"Directory not found: {directory}")
         return
 
-    glob_method = path.rglob if recursive else path.glob
-    files = [f for f in glob_method("*") if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS]
+    files = find_files(path)
 
     if not files:
         print("No supported media files found.")
@@ -170,12 +227,18 @@ def main():
     print(f"Found {len(files)} file(s). {'(DRY RUN)' if dry_run else '(RENAMING)'}\n")
 
     renamed = no_change = errors = 0
+    cache = open_cache() if use_cache and use_metadata and open_cache else None
+
+    # Phase 1: read metadata in parallel (the slow part)
+    metadata = extract_all_dates(files, cache) if use_metadata else {}
 
+    # Phase 2: plan and rename one file at a time in sorted order, so the
+    # names come out exactly as in a fully serial run
     for file_path in sorted(files):
         dt = source = None
 
         # Priority 1: Metadata
-        dt, source = get_media_creation_date(file_path)
+        dt, source = metadata.get(file_path, (None, "disabled"))
         if dt:
             source = f"metadata ({source})"
 
@@ -187,7 +250,7 @@ def main():
 
         # Priority 3: Filesystem
         if not dt:
-            dt, source = get_file_creation_date(file_path)
+            dt, source = get_file_creation_date(file_path, file_stat(files, file_path))
 
         new_name = generate_new_name(dt, file_path.suffix)
         new_path = file_path.with_name(new_name)
@@ -220,6 +283,9 @@ def main():
 
     print("\n" + "="*60)
     print(f"Summary: Renamed: {renamed} | No change: {no_change} | Errors: {errors}")
+    if cache:
+        print(f"Metadata cache: {cache.hits} hit(s), {cache.misses} file(s) read")
+        cache.close()
     if dry_run:
         print("This was a dry run. Set dry_run = False to apply changes.")
 
@@ -1,6 +1,6 @@
-import re
 from pathlib import Path
-from datetime import datetime
+
+from filename_dates import parse_filename_date
 
 # ----------------------------- CONFIGURATION -----------------------------
 directory = r"D:/test/2023/2023-01-19"  # <<< CHANGE THIS to your folder
@@ -14,56 +14,14 @@ SUPPORTED_EXTENSIONS = {
     '.mp4', '.mov', '.avi', '.mkv', '.m4v', '.3gp'
 }
 
-# ----------------------------- COMPREHENSIVE PATTERNS -----------------------------
-# Each tuple: (regex_pattern, strptime_format, example)
-DATE_PATTERNS = [
-    # 1. YYYY-MM-DD-HHhMMmSS or YYYY-MM-DD-HHhMMmSSs
-    (r"(\d{4}-\d{2}-\d{2}-\d{2}h\d{2}m\d{2}m?\d*s?)", "%Y-%m-%d-%Hh%Mm%S"),
-    
-    # 2. YYYY-MM-DD_HH-MM-SS
-    (r"(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})", "%Y-%m-%d_%H-%M-%S"),
-    
-    # 3. WhatsApp: IMG-YYYYMMDD-WAxxxx.jpg or IMG_YYYYMMDD_xxxx.jpg
-    (r"IMG[_-]?(\d{8})", "%Y%m%d"),
-    
-    # 4. Full WhatsApp/Google: IMG_YYYYMMDD_HHMMSS.jpg
-    (r"IMG[_-](\d{8}_\d{6})", "%Y%m%d_%H%M%S"),
-    
-    # 5. Google Pixel: PXL_YYYYMMDD_HHMMSS.jpg
-    (r"PXL[_-]?(\d{8}_\d{6})", "%Y%m%d_%H%M%S"),
-    
-    # 6. YYYY-MM-DD
-    (r"(\d{4}-\d{2}-\d{2})", "%Y-%m-%d"),
-    
-    # 7. YYYYMMDD (bare or at start)
-    (r"(\d{8})", "%Y%m%d"),
-    
-    # 8. Screenshot style: Screenshot_YYYY-MM-DD-HH-MM-SS.png
-    (r"Screenshot[_-]?(\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2})", "%Y-%m-%d-%H-%M-%S"),
-]
-
+# ----------------------------- DATE PATTERNS -----------------------------
+# Camera, phone, WhatsApp, Pixel, screenshot and our own renamed names are all
+# parsed by the shared compiled engine in filename_dates.py
 def extract_date_from_filename(filename: str) -> str | None:
     """Return date string in 'YYYY:MM:DD HH:MM:SS' format or None."""
-    stem = Path(filename).stem
-
-    for pattern, fmt in DATE_PATTERNS:
-        match = re.search(pattern, stem, re.IGNORECASE)
-        if match:
-            date_str = match.group(1)
-            try:
-                # Handle different formats
-                if fmt == "%Y-%m-%d-%Hh%Mm%S":
-                    date_str = date_str.replace('h', ':').replace('m', ':').replace('s', '')
-                    dt = datetime.strptime(date_str, "%Y-%m-%d-%H:%M:%S")
-                elif fmt == "%Y-%m-%d_%H-%M-%S":
-                    dt = datetime.strptime(date_str, "%Y-%m-%d_%H-%M-%S")
-                else:
-                    dt = datetime.strptime(date_str, fmt)
-                    if len(date_str) == 8:  # Only date → midnight
-                        dt = dt.replace(hour=0, minute=0, second=0)
-                return dt.strftime("%Y:%m:%d %H:%M:%S")
-            except ValueError:
-                continue
+    dt, _ = parse_filename_date(Path(filename).stem)
+    if dt:
+        return dt.strftime("%Y:%m:%d %H:%M:%S")
     return None
 
 # ----------------------------- METADATA WRITING (OPTIONAL) -----------------------------
@@ -0,0 +1,29 @@
+import struct
+
+from media_meta import read_capture_date, MP4_EPOCH
+
+
+def box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def write_mp4(path, mvhd):
+    path.write_bytes(box(b"ftyp", b"isom\0\0\0\0") +
+                     box(b"moov", box(b"mvhd", mvhd)))
+
+
+def test_mvhd_creation_time(tmp_path):
+    path = tmp_path / "clip.mp4"
+    write_mp4(path, b"\0\0\0\0" + struct.pack(">II", 3756000000, 0) +
+              b"\0" * 80)
+    dt, source = read_capture_date(path)
+    assert source == "MP4 mvhd"
+    assert (dt - MP4_EPOCH).total_seconds() == 3756000000
+
+
+def test_oversized_mvhd_creation_time(tmp_path):
+    # version 1, 64 bit times far beyond what datetime can hold
+    path = tmp_path / "broken.mp4"
+    write_mp4(path, b"\x01\0\0\0" + struct.pack(">QQ", 2**62, 0) +
+              b"\0" * 80)
+    assert read_capture_date(path) == (None, None)
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("chirp")
+
+from chirp import chirp_common, memmap
+
+from uvk5_egzumer import UVK5Radio, MEM_SIZE, MEM_RANGES, find_band
+from uvk5_chanview import ChannelTable, WIDE_RX_OFFSET, _find_bands
+
+# band edges, shared edges and one frequency in every band
+FREQS = [18000000, 50000000, 76000000, 88000000, 108000000, 120000000,
+         136999900, 137000000, 145500000, 174000000, 350000000, 380000000,
+         400000000, 435000000, 470000000, 600000000, 1300000000]
+
+
+def blank_image(wide):
+    image = bytearray(b"\xff" * MEM_SIZE)
+    start, end = MEM_RANGES["ch_attr"]
+    image[start:end] = b"\x0f" * (end - start)
+    image[WIDE_RX_OFFSET] = 0x02 if wide else 0x00
+    return image
+
+
+@pytest.mark.parametrize("wide", [False, True])
+def test_find_bands(wide):
+    hz = np.array(FREQS + [10000000, 700000000, 1400000000])
+    assert list(_find_bands(hz, wide)) == \
+        [find_band(freq, wide) or 0 for freq in hz]
+
+
+@pytest.mark.parametrize("wide", [False, True])
+def test_set_freq_matches_set_memory(wide):
+    image = blank_image(wide)
+    radio = UVK5Radio(memmap.MemoryMapBytes(bytes(image)))
+    for number, freq in enumerate(FREQS, 1):
+        mem = chirp_common.Memory()
+        mem.number = number
+        mem.freq = freq
+        radio.set_memory(mem)
+    expected = ChannelTable.from_radio(radio)
+
+    table = ChannelTable(image)
+    table.set_freq(slice(0, len(FREQS)), np.array(FREQS))
+
+    assert list(table.attr) == list(expected.attr)
+    assert not table.empty()[:len(FREQS)].any()
+    assert list(table.decode()["band"]) == list(expected.decode()["band"])
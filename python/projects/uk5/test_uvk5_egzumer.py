@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+pytest.importorskip("chirp")
+
+from chirp import memmap
+
+from uvk5_egzumer import UVK5Radio, MEM_SIZE, TMODES
+
+
+def random_radio(seed):
+    rng = random.Random(seed)
+    image = bytearray(rng.randbytes(MEM_SIZE))
+    for ch in range(214):
+        # tone flags the driver can decode
+        image[ch*16 + 10] = rng.randrange(len(TMODES)) << 4 | \
+            rng.randrange(len(TMODES))
+    image[0x1FF0:0x1FF2] = b"\xff\xff"
+    return UVK5Radio(memmap.MemoryMapBytes(bytes(image)))
+
+
+def settings(mem):
+    return [(rs.get_name(), str(rs.value)) for rs in mem.extra]
+
+
+def test_get_memories_matches_get_memory():
+    radio = random_radio(1)
+    for mem in radio.get_memories(1, 214):
+        single = radio.get_memory(mem.number)
+        assert repr(mem) == repr(single)
+        assert settings(mem) == settings(single)
+
+
+def test_cached_memories_are_copies():
+    radio = random_radio(2)
+    first = radio.get_memory(1)
+    name, immutable, extra = first.name, list(first.immutable), \
+        settings(first)
+    first.name = "EDITED"
+    first.immutable.append("freq")
+    for rs in first.extra:
+        if rs.get_name() == "busyChLockout":
+            rs.value.set_value(not rs.value.get_value())
+
+    again = radio.get_memory(1)
+    assert (again.name, again.immutable, settings(again)) == \
+        (name, immutable, extra)
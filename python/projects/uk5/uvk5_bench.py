@@ -0,0 +1,378 @@
+# Benchmarks for the Quansheng UV-K5 (egzumer) CHIRP driver
+#
+# Runs without a radio: the serial protocol is exercised against the
+# SimulatedRadio from uvk5_sim.py.
+#
+#   python uvk5_bench.py link --latency 0.004 --runs 5
+#   python uvk5_bench.py codec
+#   python uvk5_bench.py image-open saved/*.img
+#   python uvk5_bench.py driver saved/*.img --json HEAD.json
+#   python uvk5_bench.py driver saved/*.img --compare HEAD.json
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import timeit
+
+from chirp import bitwise, memmap
+
+import uvk5_egzumer
+from uvk5_egzumer import UVK5Radio, do_download, do_upload, MEM_SIZE, \
+    MEM_FORMAT
+from uvk5_sim import SimulatedRadio
+
+
+def _report(name, nbytes, seconds, round_trips):
+    rate = nbytes / seconds if seconds else 0.0
+    rtt = statistics.mean(round_trips) * 1000 if round_trips else 0.0
+    print(f"{name:<10} {nbytes:>7} bytes {seconds*1000:>9.1f} ms "
+          f"{rate:>10.0f} bytes/s   rtt/block {rtt:6.2f} ms")
+
+
+def bench_link(args):
+    """time do_download and do_upload against a simulated radio"""
+    image = os.urandom(MEM_SIZE)
+    sim = SimulatedRadio(image, latency=args.latency, baudrate=args.baud,
+                         drop_rate=args.drop, corrupt_rate=args.corrupt,
+                         reorder_rate=args.reorder, seed=args.seed)
+    radio = UVK5Radio(sim)
+    radio.download_window = args.window
+    radio.download_resume = False
+    radio.adaptive_timeout = not args.fixed_timeout
+
+    for run in range(args.runs):
+        sim.round_trips.clear()
+        start = time.perf_counter()
+        mmap = do_download(radio)
+        elapsed = time.perf_counter() - start
+        if mmap.get_packed() != bytes(sim.eeprom):
+            print("download returned a different image!")
+        _report(f"download{run}", MEM_SIZE, elapsed, sim.round_trips[1:])
+
+    radio._mmap = memmap.MemoryMapBytes(os.urandom(MEM_SIZE))
+    nbytes = uvk5_egzumer.PROG_SIZE
+    for run in range(args.runs):
+        sim.round_trips.clear()
+        start = time.perf_counter()
+        do_upload(radio)
+        elapsed = time.perf_counter() - start
+        _report(f"upload{run}", nbytes, elapsed, sim.round_trips[1:])
+
+    print(f"commands={sim.commands} bad_frames={sim.bad_frames} "
+          f"resets={sim.resets}")
+    print(radio.link_stats.summary())
+
+
+# the framing code as it was before the codec rewrite, kept as a baseline
+
+def _legacy_xorarr(data: bytes):
+    tbl = [22, 108, 20, 230, 46, 145, 13, 64, 33, 53, 213, 64, 19, 3, 233, 128]
+    ret = b""
+    idx = 0
+    for byte in data:
+        ret += bytes([byte ^ tbl[idx]])
+        idx = (idx+1) % len(tbl)
+    return ret
+
+
+def _legacy_crc16_xmodem(data: bytes):
+    poly = 0x1021
+    crc = 0x0
+    for byte in data:
+        crc = crc ^ (byte << 8)
+        for _ in range(8):
+            crc = crc << 1
+            if crc & 0x10000:
+                crc = (crc ^ poly) & 0xFFFF
+    return crc & 0xFFFF
+
+
+def _legacy_build_frame(data: bytes):
+    crc = _legacy_crc16_xmodem(data)
+    data2 = data + struct.pack("<H", crc)
+    return struct.pack(">HBB", 0xabcd, len(data), 0) + \
+        _legacy_xorarr(data2) + \
+        struct.pack(">H", 0xdcba)
+
+
+def bench_codec(args):
+    """compare the frame codec against the old byte-at-a-time version"""
+    # a writemem command for one full block, the largest frame we send
+    data = b"\x1d\x05\x88\x00\x00\x00\x80\x01\x6a\x39\x57\x64" + \
+        os.urandom(uvk5_egzumer.MEM_BLOCK)
+
+    cases = [
+        ("xorarr", _legacy_xorarr, uvk5_egzumer.xorarr),
+        ("crc16", _legacy_crc16_xmodem, uvk5_egzumer.calculate_crc16_xmodem),
+        ("frame", _legacy_build_frame, uvk5_egzumer._build_frame),
+    ]
+    for name, old, new in cases:
+        if old(data) != new(data):
+            print(f"{name}: results differ!")
+        t_old = min(timeit.repeat(lambda: old(data), number=args.number,
+                                  repeat=3)) / args.number
+        t_new = min(timeit.repeat(lambda: new(data), number=args.number,
+                                  repeat=3)) / args.number
+        print(f"{name:<8} old {t_old*1e6:8.2f} us  new {t_new*1e6:8.2f} us  "
+              f"x{t_old / t_new:6.1f}")
+
+
+def bench_image_open(args):
+    """time parsing MEM_FORMAT against an image, uncached and cached"""
+    images = [UVK5Radio(path).get_mmap().get_packed() for path in args.images]
+    if not images:
+        images = [b"\xff" * MEM_SIZE]
+
+    def open_uncached():
+        for image in images:
+            bitwise.parse(MEM_FORMAT, memmap.MemoryMapBytes(image))
+
+    def open_cached():
+        for image in images:
+            uvk5_egzumer.parse_mmap(memmap.MemoryMapBytes(image))
+
+    start = time.perf_counter()
+    uvk5_egzumer.parse_mmap(memmap.MemoryMapBytes(images[0]))
+    first = time.perf_counter() - start
+
+    for name, func in (("uncached", open_uncached), ("cached", open_cached)):
+        secs = min(timeit.repeat(func, number=args.number, repeat=3))
+        per_image = secs / args.number / len(images)
+        print(f"{name:<9} {per_image*1000:8.2f} ms per image")
+    print(f"first cached open (layout from disk or parsed) {first*1000:.2f} ms")
+
+
+# BUILD_OPTIONS bytes at 0x1FF0 each image is also benchmarked with, None
+# keeps the bytes of the image
+BUILD_VARIANTS = {
+    "image": None,
+    "all": b"\xff\xff",
+    "none": b"\x00\x00",
+}
+
+
+def _channels(radio):
+    return list(range(1, 201)) + list(radio._get_specials())
+
+
+def _open_radio(image):
+    return UVK5Radio(memmap.MemoryMapBytes(image))
+
+
+def _variant_image(image, options):
+    if options is None:
+        return image
+    return image[:0x1FF0] + options + image[0x1FF2:]
+
+
+def _all_settings(radio):
+    # what the settings tab does: build every group
+    settings = radio.get_settings()
+    for group in settings:
+        list(group)
+    return settings
+
+
+def _get_memories(radio, _):
+    for number in _channels(radio):
+        radio.get_memory(number)
+
+
+def _get_memory_range(radio, _):
+    # what get_memories replaces: one get_memory per channel
+    for number in range(1, 201):
+        radio.get_memory(number)
+
+
+def _set_memories(radio, _):
+    for number in _channels(radio):
+        radio.set_memory(radio.get_memory(number))
+
+
+# entry point: (prepare, run), prepare(radio) is not timed and its result
+# is handed to run(radio, prepared)
+DRIVER_ENTRIES = {
+    "process_mmap": (None, lambda radio, _: radio.process_mmap()),
+    "get_memory": (None, _get_memories),
+    "get_memory_1_200": (None, _get_memory_range),
+    "get_memories": (None, lambda radio, _: radio.get_memories(1, 200)),
+    "get_settings": (None, lambda radio, _: _all_settings(radio)),
+    "set_settings": (_all_settings, lambda radio, settings:
+                     radio.set_settings(settings)),
+    "set_memory": (None, _set_memories),
+}
+
+
+def _time_entry(image, entry, repeat):
+    """
+    (cold, warm) seconds of one driver entry point. Cold is the median of
+    first calls on freshly opened radios, for process_mmap with both the
+    in-process and an empty on-disk layout cache, warm the fastest
+    repeated call
+    """
+    prepare, run = DRIVER_ENTRIES[entry]
+
+    cold = []
+    for _ in range(repeat):
+        if entry == "process_mmap":
+            prepared = None
+            uvk5_egzumer._LAYOUTS.clear()
+            cache_dir = uvk5_egzumer.LAYOUT_CACHE_DIR
+            try:
+                with tempfile.TemporaryDirectory() as tmp:
+                    uvk5_egzumer.LAYOUT_CACHE_DIR = tmp
+                    start = time.perf_counter()
+                    radio = _open_radio(image)
+                    cold.append(time.perf_counter() - start)
+            finally:
+                uvk5_egzumer.LAYOUT_CACHE_DIR = cache_dir
+        else:
+            radio = _open_radio(image)
+            prepared = prepare(radio) if prepare else None
+            start = time.perf_counter()
+            run(radio, prepared)
+            cold.append(time.perf_counter() - start)
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(radio, prepared)
+        warm.append(time.perf_counter() - start)
+
+    return statistics.median(cold), min(warm)
+
+
+def bench_driver(args):
+    """time the driver entry points over a corpus of saved images"""
+    corpus = [(os.path.basename(path),
+               UVK5Radio(path).get_mmap().get_packed())
+              for path in args.images]
+    if not corpus:
+        corpus = [("blank", b"\xff" * MEM_SIZE)]
+    entries = args.entry or DRIVER_ENTRIES
+
+    results = {}
+    for name, image in corpus:
+        for variant in args.variant or BUILD_VARIANTS:
+            case = f"{name}:{variant}"
+            data = _variant_image(image, BUILD_VARIANTS[variant])
+            results[case] = {}
+            for entry in entries:
+                cold, warm = _time_entry(data, entry, args.repeat)
+                results[case][entry] = {"cold_ms": round(cold * 1000, 3),
+                                        "warm_ms": round(warm * 1000, 3)}
+                print(f"{case:<32} {entry:<16} cold {cold*1000:9.2f} ms  "
+                      f"warm {warm*1000:9.2f} ms")
+
+    report = {
+        "label": args.label,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)["results"]
+        slower = 0
+        print(f"\ncompared to {args.compare} (new / old)")
+        for case, timings in sorted(results.items()):
+            for entry, times in timings.items():
+                old = base.get(case, {}).get(entry)
+                if old is None:
+                    continue
+                ratios = [times[key] / old[key] if old[key] else 1.0
+                          for key in ("cold_ms", "warm_ms")]
+                flag = ""
+                if max(ratios) > args.threshold:
+                    flag = "  SLOWER"
+                    slower += 1
+                print(f"{case:<32} {entry:<16} cold x{ratios[0]:5.2f}  "
+                      f"warm x{ratios[1]:5.2f}{flag}")
+        if slower:
+            print(f"{slower} timings slower than x{args.threshold}")
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the UV-K5 egzumer driver")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    link = sub.add_parser("link", help="download/upload over a simulated "
+                          "serial link")
+    link.add_argument("--latency", type=float, default=0.0,
+                      help="radio reply latency in seconds")
+    link.add_argument("--baud", type=int, default=38400,
+                      help="line speed, 0 for unthrottled")
+    link.add_argument("--drop", type=float, default=0.0,
+                      help="probability of a lost reply")
+    link.add_argument("--corrupt", type=float, default=0.0,
+                      help="probability of a corrupted reply")
+    link.add_argument("--reorder", type=float, default=0.0,
+                      help="probability of a reordered reply")
+    link.add_argument("--window", type=int,
+                      default=uvk5_egzumer.DOWNLOAD_WINDOW,
+                      help="readmem requests in flight during download")
+    link.add_argument("--fixed-timeout", action="store_true",
+                      help="always wait the full timeout for a reply")
+    link.add_argument("--runs", type=int, default=3)
+    link.add_argument("--seed", type=int, default=None)
+    link.set_defaults(func=bench_link)
+
+    codec = sub.add_parser("codec", help="frame codec micro-benchmarks")
+    codec.add_argument("--number", type=int, default=2000,
+                       help="calls per timing")
+    codec.set_defaults(func=bench_codec)
+
+    image_open = sub.add_parser("image-open", help="process_mmap latency "
+                                "with and without the layout cache")
+    image_open.add_argument("images", nargs="*", help=".img files to open")
+    image_open.add_argument("--number", type=int, default=5,
+                            help="passes per timing")
+    image_open.set_defaults(func=bench_image_open)
+
+    driver = sub.add_parser("driver", help="cold and warm timings of the "
+                            "driver entry points over saved images")
+    driver.add_argument("images", nargs="*", help=".img files, a blank "
+                        "image if none")
+    driver.add_argument("--variant", action="append",
+                        choices=list(BUILD_VARIANTS),
+                        help="BUILD_OPTIONS variants to run (default all)")
+    driver.add_argument("--entry", action="append", choices=DRIVER_ENTRIES,
+                        help="entry points to time (default all)")
+    driver.add_argument("--repeat", type=int, default=5,
+                        help="cold and warm runs per timing")
+    driver.add_argument("--label", default="",
+                        help="stored in the JSON, e.g. a commit id")
+    driver.add_argument("--json", metavar="FILE",
+                        help="write the results as JSON")
+    driver.add_argument("--compare", metavar="FILE",
+                        help="JSON results of an earlier run to compare to")
+    driver.add_argument("--threshold", type=float, default=1.25,
+                        help="exit 1 when a timing is this much slower")
+    driver.set_defaults(func=bench_driver)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# Structured NumPy view of the Quansheng UV-K5 (egzumer) channel table
+#
+# ChannelTable maps the 16 byte channel records at 0x0000, the ch_attr
+# bytes at 0xD60 and the names at 0xF50 of an eeprom image onto numpy
+# arrays. decode() turns every channel into frequency, offset, duplex,
+# tones, mode, step, power, band and name at once, the set_* methods edit
+# many channels in one go and write_to() stores the result in a CHIRP
+# memory map. Nothing here builds chirp Memory objects, so looking at
+# hundreds of saved images is a few array operations per image.
+#
+#   python uvk5_chanview.py saved/*.img --offset 600000
+#   python uvk5_chanview.py saved/*.img --freq 145.500
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import argparse
+
+# Optional: install with: pip install numpy
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from uvk5_egzumer import UVK5Radio, MEM_RANGES, MODES_LIST, STEPS, TMODES, \
+    CTCSS_TONES, DTCS_CODES, UVK5_POWER_LEVELS, SCANLIST_LIST, \
+    FLAGS1_OFFSET_MINUS, FLAGS1_OFFSET_PLUS, POWER_HIGH, POWER_MEDIUM, \
+    POWER_LOW, BAND_INDEX
+
+CHANNELS = 214
+NAMED_CHANNELS = 200
+# second BUILD_OPTIONS byte, ENABLE_WIDE_RX is its 0x02 bit
+WIDE_RX_OFFSET = 0x1FF1
+
+if np is not None:
+    # one channel record, see struct channel in MEM_FORMAT; the bitfields
+    # are kept as whole bytes and split with shifts and masks
+    CHANNEL_DTYPE = np.dtype([
+        ("freq", "<u4"),
+        ("offset", "<u4"),
+        ("rxcode", "u1"),
+        ("txcode", "u1"),
+        ("codeflags", "u1"),    # txcodeflag:4, rxcodeflag:4
+        ("modulation", "u1"),   # modulation:4, offsetDir:4
+        ("flags", "u1"),        # busyChLockout (b4), txpower:2, bw, rev
+        ("dtmf", "u1"),         # dtmf_pttid:3 (b3-1), dtmf_decode:1
+        ("step", "u1"),
+        ("scrambler", "u1"),
+    ])
+
+    # what decode() returns, one row per channel
+    DECODED_DTYPE = np.dtype([
+        ("number", "u1"),
+        ("empty", "?"),
+        ("freq", "<i8"),
+        ("offset", "<i8"),
+        ("duplex", "U3"),
+        ("mode", "U4"),
+        ("tuning_step", "<f8"),
+        ("power", "U4"),
+        ("tx_tmode", "U4"),
+        ("tx_tone", "<f8"),
+        ("rx_tmode", "U4"),
+        ("rx_tone", "<f8"),
+        ("band", "u1"),
+        ("scanlists", "U5"),
+        ("name", "U16"),
+    ])
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("uvk5_chanview needs numpy: pip install numpy")
+
+
+def _lookup(table, index, default):
+    """table[index] for every element, default where index is out of range"""
+    table = np.asarray(table)
+    index = index.astype(np.intp)
+    ok = index < len(table)
+    return np.where(ok, table[np.where(ok, index, 0)], default)
+
+
+def _find_bands(hz, wide=False):
+    """find_band for an array of frequencies, band 0 where it is False"""
+    mhz = np.asarray(hz) / 1000000.0
+    starts, ranges = BAND_INDEX[bool(wide)]
+    stops = np.array([rng[1] for rng in ranges])
+    # the first band reaching up to mhz, so a shared edge goes to the
+    # lower band like in find_band
+    idx = np.searchsorted(stops, mhz, "left")
+    ok = idx < len(ranges)
+    idx = np.where(ok, idx, 0)
+    ok &= np.asarray(starts)[idx] <= mhz
+    bands = np.array([rng[2] for rng in ranges], np.uint8)
+    return np.where(ok, bands[idx], 0).astype(np.uint8)
+
+
+class ChannelTable:
+    """read/write structured view of the channel table of one image
+
+    image is a bytearray (viewed without copying, edits land in it) or any
+    bytes-like object, which is copied first.
+    """
+
+    def __init__(self, image):
+        _require_numpy()
+        if not isinstance(image, bytearray):
+            image = bytearray(image)
+        self.image = image
+
+        start = MEM_RANGES["channels"][0]
+        self.raw = np.frombuffer(image, CHANNEL_DTYPE, CHANNELS, start)
+        start = MEM_RANGES["ch_attr"][0]
+        self.attr = np.frombuffer(image, np.uint8, NAMED_CHANNELS, start)
+        start = MEM_RANGES["channel_names"][0]
+        self.names = np.frombuffer(image, "S16", NAMED_CHANNELS, start)
+
+    @classmethod
+    def from_radio(cls, radio):
+        """a copy of the channel table of a radio or an opened .img"""
+        return cls(bytearray(radio.get_mmap().get_packed()))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_radio(UVK5Radio(path))
+
+    def __len__(self):
+        return CHANNELS
+
+    # decoding
+
+    def empty(self):
+        freq = self.raw["freq"]
+        empty = (freq == 0) | (freq == 0xffffffff)
+        empty[:NAMED_CHANNELS] |= (self.attr & 0x08).astype(bool)
+        return empty
+
+    def decode(self):
+        """every channel decoded like UVK5Radio.get_memory, as one array"""
+        raw = self.raw
+        out = np.zeros(CHANNELS, DECODED_DTYPE)
+        out["number"] = np.arange(1, CHANNELS + 1)
+        out["empty"] = self.empty()
+
+        freq = raw["freq"].astype(np.int64)
+        offset = raw["offset"].astype(np.int64)
+        out["freq"] = freq * 10
+
+        direction = raw["modulation"] & 0x0f
+        minus = direction == FLAGS1_OFFSET_MINUS
+        tx_off = (offset != 0) & minus & (freq == offset)
+        out["duplex"] = np.select(
+            [offset == 0, tx_off, minus, direction == FLAGS1_OFFSET_PLUS],
+            ["", "off", "-", "+"], "")
+        out["offset"] = np.where(tx_off, 0, offset * 10)
+
+        modul = (raw["modulation"] >> 4) * 2 + ((raw["flags"] >> 1) & 1)
+        modul = np.where(modul == 5, 4, modul)
+        out["mode"] = _lookup(MODES_LIST, modul, "")
+
+        out["tuning_step"] = _lookup(STEPS, raw["step"], 2.5)
+
+        txpower = (raw["flags"] >> 2) & 0x03
+        out["power"] = np.select(
+            [txpower == POWER_HIGH, txpower == POWER_MEDIUM],
+            [str(UVK5_POWER_LEVELS[2]), str(UVK5_POWER_LEVELS[1])],
+            str(UVK5_POWER_LEVELS[0]))
+
+        for prefix, flags, code in (
+                ("tx", raw["codeflags"] >> 4, raw["txcode"]),
+                ("rx", raw["codeflags"] & 0x0f, raw["rxcode"])):
+            tmode = _lookup(TMODES, flags, "")
+            ctcss = (tmode == "Tone") & (code < len(CTCSS_TONES))
+            dtcs = (tmode == "DTCS") & (code < len(DTCS_CODES))
+            out[prefix + "_tmode"] = np.where(ctcss | dtcs, tmode, "")
+            out[prefix + "_tone"] = np.select(
+                [ctcss, dtcs],
+                [_lookup(CTCSS_TONES, code, 0), _lookup(DTCS_CODES, code, 0)],
+                np.nan)
+
+        attr = self.attr
+        out["band"][:NAMED_CHANNELS] = attr & 0x07
+        out["scanlists"][:NAMED_CHANNELS] = \
+            np.asarray(SCANLIST_LIST)[(attr >> 7) + ((attr >> 5) & 0x02)]
+
+        # names end at the first 0x00 or 0xff
+        chars = self.names.view(np.uint8).reshape(NAMED_CHANNELS, 16)
+        stop = (chars == 0x00) | (chars == 0xff)
+        end = np.where(stop.any(axis=1), stop.argmax(axis=1), 16)
+        out["name"][:NAMED_CHANNELS] = [
+            bytes(name[:n]).decode("latin-1").rstrip()
+            for name, n in zip(chars, end)]
+
+        return out
+
+    # bulk edits, index is anything numpy accepts: a channel number array
+    # minus one, a slice or a boolean mask over the 214 channels
+
+    def wide_rx(self):
+        """True if the firmware of the image was built with ENABLE_WIDE_RX"""
+        return len(self.image) > WIDE_RX_OFFSET and \
+            bool(self.image[WIDE_RX_OFFSET] & 0x02)
+
+    def set_freq(self, index, hz):
+        """
+        change the rx frequency, keeping the tx offset. Like set_memory,
+        the band in ch_attr follows the frequency and channels 1-200 are
+        no longer marked free
+        """
+        raw = self.raw
+        raw["freq"][index] = np.asarray(hz) // 10
+        named = np.zeros(CHANNELS, bool)
+        named[index] = True
+        named = named[:NAMED_CHANNELS]
+        freq = raw["freq"][:NAMED_CHANNELS][named].astype(np.int64) * 10
+        self.attr[named] = (self.attr[named] & 0xf0) | \
+            _find_bands(freq, self.wide_rx())
+
+    def set_offset(self, index, hz, duplex):
+        """set offset and duplex ("", "+", "-" or "off") of channels"""
+        raw = self.raw
+        if duplex == "":
+            raw["offset"][index] = 0
+            direction = 0
+        elif duplex == "off":
+            raw["offset"][index] = raw["freq"][index]
+            direction = FLAGS1_OFFSET_MINUS
+        else:
+            raw["offset"][index] = np.asarray(hz) // 10
+            direction = FLAGS1_OFFSET_MINUS if duplex == "-" \
+                else FLAGS1_OFFSET_PLUS
+        raw["modulation"][index] = \
+            (raw["modulation"][index] & 0xf0) | direction
+
+    def set_power(self, index, level):
+        """level is one of UVK5_POWER_LEVELS or its name"""
+        names = [str(lvl) for lvl in UVK5_POWER_LEVELS]
+        txpower = (POWER_LOW, POWER_MEDIUM, POWER_HIGH)[
+            names.index(str(level))]
+        flags = self.raw["flags"]
+        flags[index] = (flags[index] & 0xf3) | (txpower << 2)
+
+    def set_step(self, index, step):
+        self.raw["step"][index] = STEPS.index(step)
+
+    def set_names(self, index, names):
+        """store names of the first 200 channels, padded like set_memory"""
+        if isinstance(names, str):
+            names = [names]
+        encoded = [(name.ljust(10) + "\x00" * 6)[:16].encode("latin-1")
+                   for name in names]
+        self.names[index] = encoded if len(encoded) > 1 else encoded[0]
+
+    def write_to(self, mmap):
+        """store the channel table regions in a chirp memory map"""
+        for region in ("channels", "ch_attr", "channel_names"):
+            start, end = MEM_RANGES[region]
+            mmap[start] = bytes(self.image[start:end])
+
+
+def load_tables(paths):
+    """{path: ChannelTable} for saved .img files"""
+    return {path: ChannelTable.from_file(path) for path in paths}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search the channels of many saved UV-K5 images")
+    parser.add_argument("images", nargs="+", help=".img files")
+    parser.add_argument("--offset", type=int,
+                        help="only channels with this tx offset in Hz")
+    parser.add_argument("--freq", type=float,
+                        help="only channels on this rx frequency in MHz")
+    args = parser.parse_args()
+
+    for path, table in load_tables(args.images).items():
+        chans = table.decode()
+        mask = ~chans["empty"]
+        if args.offset is not None:
+            mask &= (chans["offset"] == args.offset) & \
+                np.isin(chans["duplex"], ("+", "-"))
+        if args.freq is not None:
+            mask &= chans["freq"] == round(args.freq * 1000000)
+        for chan in chans[mask]:
+            print(f"{path}: {chan['number']:3d} {chan['name']:<10} "
+                  f"{chan['freq'] / 1e6:10.5f} {chan['duplex']:>3} "
+                  f"{chan['offset'] / 1e6:8.5f} {chan['mode']:<4} "
+                  f"{chan['power']}")
+
+
+if __name__ == "__main__":
+    main()
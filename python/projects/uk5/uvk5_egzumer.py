@@ -26,11 +26,24 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import binascii
+import bisect
+import copy
+import hashlib
+import os
+import pickle
+import re
 import struct
 import logging
+import math
+import time
+import weakref
+from collections import deque
 import wx
 
-from chirp import chirp_common, directory, bitwise, memmap, errors, util
+import chirp
+from chirp import chirp_common, directory, bitwise, bitwise_grammar, \
+    memmap, errors, util
 from chirp.settings import RadioSetting, RadioSettingGroup, \
     RadioSettingValueBoolean, RadioSettingValueList, \
     RadioSettingValueInteger, RadioSettingValueString, \
@@ -381,6 +394,9 @@ BACKLIGHT_LVL_LIST = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
 # Backlight _TX_RX_LIST
 BACKLIGHT_TX_RX_LIST = ["OFF", "TX", "RX", "TX/RX"]
 
+# modulation * 2 + bandwidth
+MODES_LIST = ["FM", "NFM", "AM", "NAM", "USB"]
+
 # steps TODO: change order
 STEPS = [2.5, 5, 6.25, 10, 12.5, 25, 8.33, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 1.25,
          9, 15, 20, 30, 50, 100, 125, 200, 250, 500]
@@ -444,7 +460,69 @@ VOX_LIST = ["OFF", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
 MEM_SIZE = 0x2000  # size of all memory
 PROG_SIZE = 0x1d00  # size of the memory that we will write
 MEM_BLOCK = 0x80  # largest block of memory that we can reliably write
+DOWNLOAD_WINDOW = 4  # readmem requests kept in flight while downloading
+
+# serial read timeout, adapted to the measured round trip time of each
+# kind of command once RTT_MIN_SAMPLES replies have been seen, never more
+# than the session timeout. A command whose reply does not come in time is
+# sent again up to REPLY_RETRIES times, doubling the timeout every time
+# (up to MAX_BACKOFF times the adapted one, still within the session timeout)
+MIN_TIMEOUT = 0.05
+RTT_MIN_SAMPLES = 8
+REPLY_RETRIES = 3
+MAX_BACKOFF = 16
+
+# last known radio image per serial port and firmware version, used by
+# incremental uploads when the image being uploaded was not downloaded in
+# this session. Only trusted once the radio's calibration matches it
+_IMAGE_SNAPSHOTS = {}
 CAL_START = 0x1E00 # calibration memory start address
+MEM_CACHE_SIZE = 1024  # decoded memories kept by get_memory
+
+# blocks of an interrupted download are kept here so the next attempt on
+# the same radio only has to fetch the rest. A radio is told apart by its
+# calibration blocks, read first, and before resuming RESUME_CHECK_BLOCKS
+# of the saved blocks are read again to make sure it was not changed since
+CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".cache",
+                              "uvk5_egzumer", "downloads")
+CHECKPOINT_MAX_AGE = 3600  # seconds a partial download can be resumed
+RESUME_CHECK_BLOCKS = 4
+
+# eeprom regions that can be downloaded on their own, (start, stop)
+MEM_RANGES = {
+    "channels": (0x0000, 0x0d60),
+    "ch_attr": (0x0d60, 0x0e40),
+    "settings": (0x0e40, 0x0f50),
+    "channel_names": (0x0f50, 0x1bd0),
+    "dtmf_contacts": (0x1c00, 0x1d00),
+    "calibration": (CAL_START, MEM_SIZE),
+}
+
+# eeprom ranges every settings group is decoded from, the last two bytes
+# of the calibration area hold BUILD_OPTIONS
+SETTINGS_RANGES = {
+    "basic": ((0x0e70, 0x0f50), (0x1ff0, 0x1ff2)),
+    "advanced": ((0x0e70, 0x0f50), (0x1ff0, 0x1ff2)),
+    "keya": ((0x0e90, 0x0ea0), (0x1ff0, 0x1ff2)),
+    "dtmf": ((0x0ed0, 0x0f18), (0x0f40, 0x0f50), (0x1ff0, 0x1ff2)),
+    "dtmfc": ((0x1c00, 0x1d00),),
+    "scn": ((0x0f18, 0x0f20),),
+    "unlock": ((0x0f40, 0x0f50),),
+    "fmradio": ((0x0e40, 0x0e70),),
+    "roinfo": (),
+    "calibration": ((CAL_START, MEM_SIZE),),
+}
+
+# the per channel arrays of the memory channels 1-200 as (start, record
+# size, erased record), what set_memory writes for an empty memory
+CHANNEL_ARRAYS = (
+    (MEM_RANGES["channels"][0], 16, b"\xFF" * 16),
+    (MEM_RANGES["channel_names"][0], 16, b"\xFF" * 16),
+    (MEM_RANGES["ch_attr"][0], 1, b"\x0F"),  # is_free, band 7
+)
+
+# struct channel of MEM_FORMAT, for decoding many channels without bitwise
+CHANNEL_STRUCT = struct.Struct("<IIBBBBBBBB")
 
 # fm radio supported frequencies
 FMMIN = 76.0
@@ -498,15 +576,24 @@ KEYACTIONS_LIST = ["NONE",
 
 MIC_GAIN_LIST = ["+1.1dB","+4.0dB","+8.0dB","+12.0dB","+15.1dB"]
 
+# the communication is obfuscated by XORing it with this repeating key
+XOR_KEY = bytes([22, 108, 20, 230, 46, 145, 13, 64,
+                 33, 53, 213, 64, 19, 3, 233, 128])
+
+# key repeated to cover the longest possible frame body (255 bytes + crc)
+_XOR_KEYSTREAM = XOR_KEY * 17
+
+
 def xorarr(data: bytes):
     """the communication is obfuscated using this fine mechanism"""
-    tbl = [22, 108, 20, 230, 46, 145, 13, 64, 33, 53, 213, 64, 19, 3, 233, 128]
-    ret = b""
-    idx = 0
-    for byte in data:
-        ret += bytes([byte ^ tbl[idx]])
-        idx = (idx+1) % len(tbl)
-    return ret
+    size = len(data)
+    key = _XOR_KEYSTREAM
+    if size > len(key):
+        key = XOR_KEY * (size // len(XOR_KEY) + 1)
+    # XOR the whole buffer at once as one big integer
+    val = int.from_bytes(data, "little") ^ \
+        int.from_bytes(memoryview(key)[:size], "little")
+    return val.to_bytes(size, "little")
 
 
 def calculate_crc16_xmodem(data: bytes):
@@ -515,76 +602,217 @@ def calculate_crc16_xmodem(data: bytes):
     would be a measure to increase reliability.
     but it's only used towards the radio, so it's for further obfuscation
     """
-    poly = 0x1021
-    crc = 0x0
-    for byte in data:
-        crc = crc ^ (byte << 8)
-        for _ in range(8):
-            crc = crc << 1
-            if crc & 0x10000:
-                crc = (crc ^ poly) & 0xFFFF
-    return crc & 0xFFFF
-
-
-def _send_command(serport, data: bytes):
-    """Send a command to UV-K5 radio"""
-    LOG.debug("Sending command (unobfuscated) len=0x%4.4x:\n%s",
-              len(data), util.hexprint(data))
-
-    crc = calculate_crc16_xmodem(data)
-    data2 = data + struct.pack("<H", crc)
-
-    command = struct.pack(">HBB", 0xabcd, len(data), 0) + \
-        xorarr(data2) + \
-        struct.pack(">H", 0xdcba)
+    # crc_hqx is the table driven CRC-CCITT (poly 0x1021), with an initial
+    # value of 0 it is the XMODEM variant
+    return binascii.crc_hqx(data, 0)
+
+
+def _build_frame(data: bytes):
+    """build the obfuscated frame for a command in a single buffer"""
+    size = len(data)
+    frame = bytearray(size + 8)
+    view = memoryview(frame)
+    struct.pack_into(">HBB", frame, 0, 0xabcd, size, 0)
+    view[4:4+size] = data
+    struct.pack_into("<H", frame, 4+size, calculate_crc16_xmodem(data))
+    view[4:6+size] = xorarr(view[4:6+size])
+    struct.pack_into(">H", frame, 6+size, 0xdcba)
+    return frame
+
+
+class LinkStats:
+    """
+    round trip times and error counters of a serial link. The read timeout
+    follows the smoothed round trip time plus four times its variation,
+    the way TCP computes its retransmission timeout. Reads, writes and
+    hellos take different times on the radio, each kind of command has
+    its own estimate. A timeout doubles the next ones until a reply comes
+    """
+
+    # upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5)
+
+    def __init__(self, timeout=0.5, adaptive=True):
+        self.max_timeout = timeout
+        self.adaptive = adaptive
+        # kind of command: [srtt, rttvar, samples]
+        self.rtt = {}
+        self.backoff = 1
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+        self.retries = 0
+        self.short_reads = 0
+        self.bad_headers = 0
+        self.bad_footers = 0
+        # commands in flight: (time sent, kind, rtt can be sampled)
+        self._sent = deque()
+
+    def sent(self, kind="read", resent=False):
+        """
+        a command expecting a reply went out. The reply to a command sent
+        again may belong to either copy, it is not used as an rtt sample
+        """
+        self._sent.append((time.perf_counter(), kind, not resent))
+
+    def received(self):
+        """a reply arrived for the oldest command in flight"""
+        self.backoff = 1
+        if not self._sent:
+            return
+        start, kind, sample = self._sent.popleft()
+        if not sample:
+            return
+        rtt = time.perf_counter() - start
+        self.histogram[bisect.bisect_left(self.BUCKETS, rtt)] += 1
+        est = self.rtt.get(kind)
+        if est is None:
+            self.rtt[kind] = [rtt, rtt / 2, 1]
+        else:
+            est[1] = 0.75 * est[1] + 0.25 * abs(est[0] - rtt)
+            est[0] = 0.875 * est[0] + 0.125 * rtt
+            est[2] += 1
+
+    def failed(self):
+        """the reply for the oldest command in flight was lost or bad"""
+        if self._sent:
+            self._sent.popleft()
+
+    def timed_out(self):
+        """a reply did not come in time, wait twice as long from now on"""
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+    def flushed(self):
+        self._sent.clear()
+
+    def timeout(self, kind=None):
+        """
+        read timeout to use now for a reply to kind, by default the oldest
+        command in flight, rounded up to 10ms and never more than the
+        session timeout
+        """
+        if kind is None:
+            kind = self._sent[0][1] if self._sent else "read"
+        est = self.rtt.get(kind)
+        if not self.adaptive or est is None or est[2] < RTT_MIN_SAMPLES:
+            return self.max_timeout
+        timeout = math.ceil((est[0] + 4 * est[1]) * 100) / 100
+        timeout = max(timeout, MIN_TIMEOUT) * self.backoff
+        return min(timeout, self.max_timeout)
+
+    def summary(self):
+        lines = []
+        for kind, (srtt, rttvar, samples) in sorted(self.rtt.items()):
+            lines.append(f"{kind} rtt {srtt * 1000:.1f}ms +/- "
+                         f"{rttvar * 1000:.1f}ms over {samples} replies, "
+                         f"timeout {self.timeout(kind):.2f}s")
+        lines.append(f"retries {self.retries}, "
+                     f"short reads {self.short_reads}, "
+                     f"bad headers {self.bad_headers}, "
+                     f"bad footers {self.bad_footers}")
+        lower = 0
+        for upper, count in zip(self.BUCKETS + (math.inf,), self.histogram):
+            if count:
+                lines.append(f"  {lower*1000:5.0f}-{upper*1000:<5.0f}ms "
+                             f"{count}")
+            lower = upper
+        return "\n".join(lines)
+
+
+_LINK_STATS = weakref.WeakKeyDictionary()
+
+
+def link_stats(serport):
+    """the LinkStats of a serial port, created on first use"""
+    try:
+        return _LINK_STATS.setdefault(serport, LinkStats())
+    except TypeError:
+        return LinkStats()
+
+
+def _send_command(serport, data: bytes, kind=None, resent=False):
+    """
+    Send a command to UV-K5 radio. kind ("read", "write", "hello") is
+    given for commands the radio answers, their round trip is measured
+    """
+    # hexprint is expensive, only build the dumps when they are logged
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug("Sending command (unobfuscated) len=0x%4.4x:\n%s",
+                  len(data), util.hexprint(data))
+
+    command = _build_frame(data)
     if DEBUG_SHOW_OBFUSCATED_COMMANDS:
         LOG.debug("Sending command (obfuscated):\n%s", util.hexprint(command))
     try:
         result = serport.write(command)
     except Exception as e:
         raise errors.RadioError("Error writing data to radio") from e
+    if kind:
+        link_stats(serport).sent(kind, resent)
     return result
 
 
 def _receive_reply(serport):
+    stats = link_stats(serport)
+    timeout = stats.timeout()
+    if serport.timeout != timeout:
+        serport.timeout = timeout
+
     header = serport.read(4)
     if len(header) != 4:
+        stats.short_reads += 1
+        stats.failed()
+        stats.timed_out()
         LOG.warning("Header short read: [%s] len=%i",
                     util.hexprint(header), len(header))
         raise errors.RadioError("Header short read")
     if header[0] != 0xAB or header[1] != 0xCD or header[3] != 0x00:
+        stats.bad_headers += 1
+        stats.failed()
         LOG.warning("Bad response header: %s len=%i",
                     util.hexprint(header), len(header))
         raise errors.RadioError("Bad response header")
 
-    cmd = serport.read(int(header[2]))
-    if len(cmd) != int(header[2]):
+    # body and footer in one read
+    size = int(header[2])
+    rest = serport.read(size + 4)
+    cmd = rest[:size]
+    if len(cmd) != size:
+        stats.short_reads += 1
+        stats.failed()
+        stats.timed_out()
         LOG.warning("Body short read: [%s] len=%i",
                     util.hexprint(cmd), len(cmd))
         raise errors.RadioError("Command body short read")
 
-    footer = serport.read(4)
+    footer = rest[size:]
 
     if len(footer) != 4:
+        stats.short_reads += 1
+        stats.failed()
+        stats.timed_out()
         LOG.warning("Footer short read: [%s] len=%i",
                     util.hexprint(footer), len(footer))
         raise errors.RadioError("Footer short read")
 
     if footer[2] != 0xDC or footer[3] != 0xBA:
+        stats.bad_footers += 1
+        stats.failed()
         LOG.debug("Reply before bad response footer (obfuscated)"
                 "len=0x%4.4x:\n%s", len(cmd), util.hexprint(cmd))
         LOG.warning("Bad response footer: %s len=%i",
                     util.hexprint(footer), len(footer))
         raise errors.RadioError("Bad response footer")
 
+    stats.received()
+
     if DEBUG_SHOW_OBFUSCATED_COMMANDS:
         LOG.debug("Received reply (obfuscated) len=0x%4.4x:\n%s",
                   len(cmd), util.hexprint(cmd))
 
     cmd2 = xorarr(cmd)
 
-    LOG.debug("Received reply (unobfuscated) len=0x%4.4x:\n%s",
-              len(cmd2), util.hexprint(cmd2))
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug("Received reply (unobfuscated) len=0x%4.4x:\n%s",
+                  len(cmd2), util.hexprint(cmd2))
 
     return cmd2
 
@@ -603,16 +831,25 @@ def _sayhello(serport):
     hellopacket = b"\x14\x05\x04\x00\x6a\x39\x57\x64"
 
     tries = 5
+    delay = 0.1
     while True:
         LOG.debug("Sending hello packet")
-        _send_command(serport, hellopacket)
-        rep = _receive_reply(serport)
+        _send_command(serport, hellopacket, "hello")
+        try:
+            rep = _receive_reply(serport)
+        except errors.RadioError:
+            rep = None
         if rep:
             break
         tries -= 1
         if tries == 0:
             LOG.warning("Failed to initialise radio")
             raise errors.RadioError("Failed to initialize radio")
+        # back off, the radio may still be busy or the line noisy
+        link_stats(serport).retries += 1
+        LOG.debug("No answer to hello, retrying in %.1fs", delay)
+        _flush_replies(serport, delay)
+        delay *= 2
     if rep.startswith(b'\x18\x05'):
         raise errors.RadioError("Radio is in programming mode, "
                                 "restart radio into normal mode")
@@ -622,18 +859,108 @@ def _sayhello(serport):
     return firmware
 
 
-def _readmem(serport, offset, length):
+def _readmem_request(serport, offset, length, resent=False):
+    """send a readmem command without waiting for the reply"""
     LOG.debug("Sending readmem offset=0x%4.4x len=0x%4.4x", offset, length)
 
     readmem = b"\x1b\x05\x08\x00" + \
         struct.pack("<HBB", offset, length, 0) + \
         b"\x6a\x39\x57\x64"
-    _send_command(serport, readmem)
+    _send_command(serport, readmem, "read", resent)
+
+
+def _readmem_reply(serport):
+    """receive a readmem reply, returns the offset it carries and the data"""
     rep = _receive_reply(serport)
     if DEBUG_SHOW_MEMORY_ACTIONS:
         LOG.debug("readmem Received data len=0x%4.4x:\n%s",
                   len(rep), util.hexprint(rep))
-    return rep[8:]
+    if len(rep) < 8:
+        return None, b""
+    return rep[4] | (rep[5] << 8), rep[8:]
+
+
+def _readmem(serport, offset, length):
+    buf = bytearray(MEM_SIZE)
+    _read_blocks(serport, buf, [offset], block_len=length)
+    return bytes(buf[offset:offset+length])
+
+
+def _retry_reply(serport, what, kind):
+    """
+    count a lost or bad reply and throw away whatever is still on its
+    way, waiting the now doubled timeout for stragglers
+    """
+    stats = link_stats(serport)
+    stats.retries += 1
+    LOG.warning("No good reply to %s, sending it again", what)
+    _flush_replies(serport, stats.timeout(kind))
+
+
+def _flush_replies(serport, delay=None):
+    """wait for replies still in flight and throw them away"""
+    if delay is None:
+        delay = serport.timeout or 0
+    time.sleep(delay)
+    link_stats(serport).flushed()
+    if hasattr(serport, "reset_input_buffer"):
+        serport.reset_input_buffer()
+    else:
+        while serport.read(MEM_BLOCK):
+            pass
+
+
+def _read_blocks(serport, buf, addrs, window=1, progress_fn=None,
+                 block_fn=None, block_len=MEM_BLOCK):
+    """
+    read block_len sized blocks at addrs into buf, keeping up to window
+    readmem requests in flight. Replies are matched to the requests by the
+    offset they carry. If a reply is lost or arrives out of order the
+    remaining blocks are read one at a time (stop-and-wait), where a block
+    is requested again up to REPLY_RETRIES times before giving up.
+    block_fn(offset, data) is called for every block received
+    """
+    todo = deque(addrs)
+    pending = deque()
+    done = 0
+    attempts = 0
+    while todo or pending:
+        while todo and len(pending) < window:
+            addr = todo.popleft()
+            _readmem_request(serport, addr, block_len, attempts > 0)
+            pending.append(addr)
+
+        expected = pending.popleft()
+        try:
+            offset, data = _readmem_reply(serport)
+        except errors.RadioError:
+            offset, data = None, b""
+
+        if offset != expected or len(data) != block_len:
+            if window == 1:
+                attempts += 1
+                if attempts > REPLY_RETRIES:
+                    raise errors.RadioError("Memory download incomplete")
+                _retry_reply(serport, "readmem 0x%4.4x" % expected, "read")
+                todo.appendleft(expected)
+                continue
+            LOG.warning("readmem reply for 0x%4.4x lost or out of order, "
+                        "falling back to stop-and-wait", expected)
+            link_stats(serport).retries += 1
+            _flush_replies(serport)
+            pending.appendleft(expected)
+            todo.extendleft(reversed(pending))
+            pending.clear()
+            window = 1
+            continue
+
+        attempts = 0
+        buf[offset:offset+block_len] = data
+        if block_fn:
+            block_fn(offset, data)
+        done += 1
+        if progress_fn:
+            progress_fn(done)
 
 
 def _writemem(serport, data, offset):
@@ -649,18 +976,28 @@ def _writemem(serport, data, offset):
         struct.pack("<BBHBB", dlen+8, 0, offset, dlen, 1) + \
         b"\x6a\x39\x57\x64"+data
 
-    _send_command(serport, writemem)
-    rep = _receive_reply(serport)
+    # writing the same block again is harmless, so a late or mangled
+    # reply is answered by sending the command again
+    for attempt in range(REPLY_RETRIES + 1):
+        _send_command(serport, writemem, "write", attempt > 0)
+        try:
+            rep = _receive_reply(serport)
+        except errors.RadioError:
+            if attempt == REPLY_RETRIES:
+                raise
+            _retry_reply(serport, "writemem 0x%4.4x" % offset, "write")
+            continue
 
-    LOG.debug("writemem Received data: %s len=%i", util.hexprint(rep), len(rep))
+        LOG.debug("writemem Received data: %s len=%i",
+                  util.hexprint(rep), len(rep))
 
-    if (rep[0] == 0x1e and
-        rep[4] == (offset & 0xff) and
-        rep[5] == (offset >> 8) & 0xff):
-        return True
+        if (rep[0] == 0x1e and
+            rep[4] == (offset & 0xff) and
+            rep[5] == (offset >> 8) & 0xff):
+            return True
 
-    LOG.warning("Bad data from writemem")
-    raise errors.RadioError("Bad response to writemem")
+        LOG.warning("Bad data from writemem")
+        raise errors.RadioError("Bad response to writemem")
 
 
 def _resetradio(serport):
@@ -668,42 +1005,367 @@ def _resetradio(serport):
     _send_command(serport, resetpacket)
 
 
+def _radio_identity(image):
+    """
+    fingerprint of a radio: a hash of its calibration, which is measured
+    for every radio at the factory and differs even between radios with
+    the same firmware
+    """
+    return hashlib.sha1(bytes(image[CAL_START:MEM_SIZE])).hexdigest()[:16]
+
+
+class UVK5Session:
+    """
+    a programming session with a radio: the serial port is kept open and
+    the radio is greeted once, after which any sequence of reads and writes
+    can be done. The radio is only reset by close(), and only if something
+    was written. The duration of every operation is kept in timings as
+    (operation, bytes, seconds), round trip times and link errors in stats
+    (also radio.link_stats). timeout is the longest the driver waits for a
+    reply, with radio.adaptive_timeout it waits less once the link is known
+    """
+
+    def __init__(self, radio, timeout=0.5):
+        self.radio = radio
+        self.serport = radio.pipe
+        self.serport.timeout = timeout
+        self.firmware = None
+        self.written = False
+        self.timings = []
+        self.stats = LinkStats(timeout, radio.adaptive_timeout)
+        try:
+            _LINK_STATS[self.serport] = self.stats
+        except TypeError:
+            pass
+        radio.link_stats = self.stats
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(reset=self.written and exc_type is None)
+
+    def _timed(self, operation, nbytes, start):
+        self.timings.append((operation, nbytes, time.perf_counter() - start))
+
+    def open(self):
+        """greet the radio, returns its firmware version"""
+        start = time.perf_counter()
+        self.firmware = _sayhello(self.serport)
+        if self.firmware:
+            self.radio.FIRMWARE_VERSION = self.firmware
+        self._timed("hello", 0, start)
+        return self.firmware
+
+    def read_blocks(self, buf, addrs, progress_fn=None, block_fn=None):
+        """read the MEM_BLOCK sized blocks at addrs into buf"""
+        start = time.perf_counter()
+        addrs = list(addrs)
+        _read_blocks(self.serport, buf, addrs, self.radio.download_window,
+                     progress_fn, block_fn)
+        self._timed("read", len(addrs) * MEM_BLOCK, start)
+
+    def write_blocks(self, image, addrs, progress_fn=None):
+        """write the MEM_BLOCK sized blocks at addrs from image"""
+        start = time.perf_counter()
+        addrs = list(addrs)
+        for idx, addr in enumerate(addrs):
+            dat = image[addr:addr+MEM_BLOCK]
+            if not dat:
+                raise errors.RadioError("Memory upload incomplete")
+            _writemem(self.serport, dat, addr)
+            self.written = True
+            if progress_fn:
+                progress_fn(idx + 1)
+        self._timed("write", len(addrs) * MEM_BLOCK, start)
+
+    def verify_blocks(self, image, addrs, progress_fn=None, retries=2):
+        """
+        read back the blocks at addrs and compare their checksums with the
+        ones in image, rewriting only the blocks that differ. Returns the
+        number of blocks that had to be rewritten
+        """
+        start = time.perf_counter()
+        addrs = list(addrs)
+        expected = {addr: calculate_crc16_xmodem(image[addr:addr+MEM_BLOCK])
+                    for addr in addrs}
+        buf = bytearray(MEM_SIZE)
+        rewritten = 0
+        for attempt in range(retries + 1):
+            _read_blocks(self.serport, buf, addrs,
+                         self.radio.download_window, progress_fn)
+            addrs = [addr for addr in addrs
+                     if calculate_crc16_xmodem(buf[addr:addr+MEM_BLOCK]) !=
+                     expected[addr]]
+            if not addrs:
+                break
+            LOG.warning("Verify pass %i: %i blocks differ, rewriting",
+                        attempt, len(addrs))
+            if attempt == retries:
+                raise errors.RadioError("Upload verification failed at " +
+                                        ", ".join("0x%4.4x" % addr
+                                                  for addr in addrs))
+            for addr in addrs:
+                _writemem(self.serport, image[addr:addr+MEM_BLOCK], addr)
+            self.written = True
+            rewritten += len(addrs)
+        self._timed("verify", len(expected) * MEM_BLOCK, start)
+        return rewritten
+
+    def identify(self, buf):
+        """
+        read the calibration blocks into buf and return the fingerprint of
+        the radio they belong to
+        """
+        self.read_blocks(buf, range(CAL_START, MEM_SIZE, MEM_BLOCK))
+        return _radio_identity(buf)
+
+    def close(self, reset=None):
+        """end the session, resetting the radio if anything was written"""
+        if reset is None:
+            reset = self.written
+        if reset:
+            start = time.perf_counter()
+            _resetradio(self.serport)
+            self._timed("reset", 0, start)
+        LOG.info("Serial link: %s", self.stats.summary())
+
+
+class _DownloadCheckpoint:
+    """
+    the blocks of a download saved as they arrive, in a file named after
+    the serial port, firmware version and radio identity. The file holds
+    the image followed by a (saved, crc16) record for every block
+    """
+
+    RECORD = struct.Struct("<BH")
+
+    def __init__(self, port, firmware, identity):
+        key = hashlib.sha1(
+            f"{port}\0{firmware}\0{identity}".encode()).hexdigest()
+        self.path = os.path.join(CHECKPOINT_DIR, key[:16] + ".part")
+        self.image = bytearray(MEM_SIZE)
+        self.crcs = {}
+        self._file = None
+
+    def load(self):
+        """take over the blocks saved by an earlier attempt"""
+        try:
+            if time.time() - os.path.getmtime(self.path) > \
+                    CHECKPOINT_MAX_AGE:
+                self.discard()
+                return
+            with open(self.path, "rb") as cpfile:
+                data = cpfile.read()
+        except OSError:
+            return
+
+        nblocks = MEM_SIZE // MEM_BLOCK
+        if len(data) != MEM_SIZE + nblocks * self.RECORD.size:
+            return
+        for idx in range(nblocks):
+            addr = idx * MEM_BLOCK
+            saved, crc = self.RECORD.unpack_from(
+                data, MEM_SIZE + idx * self.RECORD.size)
+            block = data[addr:addr+MEM_BLOCK]
+            if saved and calculate_crc16_xmodem(block) == crc:
+                self.image[addr:addr+MEM_BLOCK] = block
+                self.crcs[addr] = crc
+
+    def save(self, addr, data):
+        """record one block, stop checkpointing if the file is unwritable"""
+        if self._file is False:
+            return
+        crc = calculate_crc16_xmodem(data)
+        self.crcs[addr] = crc
+        try:
+            if self._file is None:
+                os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+                self._file = open(self.path, "w+b")
+                self._file.write(self.image)
+                for blk in range(0, MEM_SIZE, MEM_BLOCK):
+                    self._file.write(self.RECORD.pack(
+                        blk in self.crcs, self.crcs.get(blk, 0)))
+            self._file.seek(addr)
+            self._file.write(data)
+            self._file.seek(MEM_SIZE + addr // MEM_BLOCK * self.RECORD.size)
+            self._file.write(self.RECORD.pack(1, crc))
+            self._file.flush()
+        except OSError as e:
+            LOG.debug("Not checkpointing the download in %s: %s",
+                      self.path, e)
+            self.close()
+            self._file = False
+
+    def close(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+
+    def discard(self):
+        self.close()
+        self.image = bytearray(MEM_SIZE)
+        self.crcs = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
 def do_download(radio):
-    """download eeprom from radio"""
-    serport = radio.pipe
-    serport.timeout = 0.5
+    """
+    download eeprom from radio. Blocks are checkpointed as they arrive, if
+    the download fails the next one from the same radio resumes from the
+    first missing block (see CHECKPOINT_DIR)
+    """
     status = chirp_common.Status()
     status.cur = 0
     status.max = MEM_SIZE
     status.msg = "Downloading from radio"
     radio.status_fn(status)
 
-    eeprom = b""
-    f = _sayhello(serport)
-    if f:
-        radio.FIRMWARE_VERSION = f
-    else:
-        raise errors.RadioError("Failed to initialize radio")
+    with UVK5Session(radio) as session:
+        if not session.firmware:
+            raise errors.RadioError("Failed to initialize radio")
+
+        # the calibration tells which radio this is, read it first
+        calibration = bytearray(MEM_SIZE)
+        identity = session.identify(calibration)
+        cal_addrs = range(CAL_START, MEM_SIZE, MEM_BLOCK)
+
+        checkpoint = _DownloadCheckpoint(getattr(radio.pipe, "port", None),
+                                         session.firmware, identity)
+        if radio.download_resume:
+            checkpoint.load()
+        if checkpoint.crcs:
+            # make sure the radio still holds what was saved: the
+            # calibration just read and a spread of the other saved blocks
+            saved = sorted(checkpoint.crcs)
+            sample = set(saved[::max(1, len(saved) // RESUME_CHECK_BLOCKS)])
+            sample.add(saved[-1])
+            sample.difference_update(cal_addrs)
+            block = bytearray(calibration)
+            session.read_blocks(block, sorted(sample))
+            if any(block[addr:addr+MEM_BLOCK] !=
+                   checkpoint.image[addr:addr+MEM_BLOCK]
+                   for addr in sample.union(cal_addrs)
+                   if addr in checkpoint.crcs):
+                LOG.info("Radio changed since the interrupted download, "
+                         "starting over")
+                checkpoint.discard()
+            else:
+                LOG.info("Resuming download, %i blocks already saved",
+                         len(checkpoint.crcs))
+
+        eeprom = checkpoint.image
+        eeprom[CAL_START:MEM_SIZE] = calibration[CAL_START:MEM_SIZE]
+        if radio.download_resume:
+            for addr in cal_addrs:
+                checkpoint.save(addr, eeprom[addr:addr+MEM_BLOCK])
+        addrs = [addr for addr in range(0, MEM_SIZE, MEM_BLOCK)
+                 if addr not in checkpoint.crcs and addr not in cal_addrs]
+        done = MEM_SIZE // MEM_BLOCK - len(addrs)
+
+        def progress(blocks):
+            status.cur = (done + blocks) * MEM_BLOCK
+            radio.status_fn(status)
+
+        progress(0)
+        try:
+            session.read_blocks(eeprom, addrs, progress,
+                                checkpoint.save if radio.download_resume
+                                else None)
+        finally:
+            checkpoint.close()
+        checkpoint.discard()
+
+    eeprom = bytes(eeprom)
+    radio.radio_snapshot = eeprom
+    radio.cached_blocks = ()
+    _IMAGE_SNAPSHOTS[_snapshot_key(radio)] = eeprom
+    return memmap.MemoryMapBytes(eeprom)
+
+
+def _range_blocks(ranges):
+    """addresses of the blocks covering the (start, stop) address ranges"""
+    addrs = set()
+    for start, stop in ranges:
+        addrs.update(range(start - start % MEM_BLOCK, stop, MEM_BLOCK))
+    return sorted(addrs)
+
+
+def do_download_ranges(radio, ranges, base=None):
+    """
+    download only the given eeprom ranges, either (start, stop) tuples or
+    names from MEM_RANGES, and merge them into base. Without a base the
+    image last downloaded by this radio object is used, or else its
+    current one.
+    The blocks not read are listed in radio.cached_blocks
+    """
+    ranges = [MEM_RANGES[rng] if isinstance(rng, str) else rng
+              for rng in ranges]
+    addrs = _range_blocks(ranges)
+
+    status = chirp_common.Status()
+    status.cur = 0
+    status.max = len(addrs) * MEM_BLOCK
+    status.msg = "Downloading from radio"
+    radio.status_fn(status)
 
-    addr = 0
-    while addr < MEM_SIZE:
-        data = _readmem(serport, addr, MEM_BLOCK)
-        status.cur = addr
+    def progress(blocks):
+        status.cur = blocks * MEM_BLOCK
         radio.status_fn(status)
 
-        if data and len(data) == MEM_BLOCK:
-            eeprom += data
-            addr += MEM_BLOCK
-        else:
-            raise errors.RadioError("Memory download incomplete")
+    with UVK5Session(radio) as session:
+        if not session.firmware:
+            raise errors.RadioError("Failed to initialize radio")
 
+        if base is None:
+            base = radio.radio_snapshot
+        # only an image read from the radio can stand for what it holds
+        from_radio = base is not None and base is radio.radio_snapshot
+        if base is None and radio.get_mmap() is not None:
+            base = radio.get_mmap().get_packed()
+        if base is None:
+            raise errors.RadioError("Partial download needs an existing "
+                                    "image, download the whole radio first")
+
+        eeprom = bytearray(base)
+        session.read_blocks(eeprom, addrs, progress)
+
+    eeprom = bytes(eeprom)
+    fresh = set(addrs)
+    radio.cached_blocks = tuple(addr for addr in range(0, MEM_SIZE, MEM_BLOCK)
+                                if addr not in fresh)
+    if from_radio:
+        radio.radio_snapshot = eeprom
+        _IMAGE_SNAPSHOTS[_snapshot_key(radio)] = eeprom
     return memmap.MemoryMapBytes(eeprom)
 
 
+def _snapshot_key(radio):
+    return getattr(radio.pipe, "port", None), radio.FIRMWARE_VERSION
+
+
+def _dirty_blocks(snapshot, image, addrs):
+    """addresses of the blocks where image differs from snapshot"""
+    if snapshot is None:
+        return list(addrs)
+    return [addr for addr in addrs
+            if snapshot[addr:addr+MEM_BLOCK] != image[addr:addr+MEM_BLOCK]]
+
+
+def _apply_blocks(snapshot, image, addrs):
+    """snapshot with the blocks at addrs replaced by the ones from image"""
+    buf = bytearray(snapshot)
+    for addr in addrs:
+        buf[addr:addr+MEM_BLOCK] = image[addr:addr+MEM_BLOCK]
+    return bytes(buf)
+
+
 def do_upload(radio):
     """upload configuration to radio eeprom"""
-    serport = radio.pipe
-    serport.timeout = 0.5
     status = chirp_common.Status()
     status.cur = 0
     status.msg = "Uploading to radio"
@@ -719,29 +1381,205 @@ def do_upload(radio):
 
     radio.status_fn(status)
 
-    f = _sayhello(serport)
-    if f:
-        radio.FIRMWARE_VERSION = f
-    else:
-        return False
-
-    addr = start_addr
-    while addr < stop_addr:
-        dat = radio.get_mmap()[addr:addr+MEM_BLOCK]
-        _writemem(serport, dat, addr)
-        status.cur = addr - start_addr
+    def progress(blocks):
+        status.cur = blocks * MEM_BLOCK
         radio.status_fn(status)
-        if dat:
-            addr += MEM_BLOCK
-        else:
-            raise errors.RadioError("Memory upload incomplete")
-    status.msg = "Uploaded OK"
 
-    _resetradio(serport)
+    with UVK5Session(radio) as session:
+        if not session.firmware:
+            return False
+
+        image = radio.get_mmap().get_packed()
+        addrs = range(start_addr, stop_addr, MEM_BLOCK)
+
+        # the image the radio holds: what we downloaded from it, otherwise
+        # the last image seen on this port with the same firmware. Another
+        # radio may have been plugged in since, only blocks of a snapshot
+        # with the calibration of the radio connected now can be skipped
+        snapshot = radio.radio_snapshot
+        if snapshot is None:
+            snapshot = _IMAGE_SNAPSHOTS.get(_snapshot_key(radio))
+        if snapshot is not None and radio.upload_incremental and \
+                session.identify(bytearray(MEM_SIZE)) != \
+                _radio_identity(snapshot):
+            LOG.info("Radio does not match the last image seen, "
+                     "uploading everything")
+            snapshot = None
+            radio.radio_snapshot = None
+            _IMAGE_SNAPSHOTS.pop(_snapshot_key(radio), None)
+
+        if radio.upload_incremental:
+            addrs = _dirty_blocks(snapshot, image, addrs)
+            LOG.info("Uploading %i changed blocks", len(addrs))
+            status.max = len(addrs) * MEM_BLOCK
+            radio.status_fn(status)
+
+        session.write_blocks(image, addrs, progress)
+
+        if radio.upload_verify:
+            status.msg = "Verifying upload"
+            status.cur = 0
+            radio.status_fn(status)
+            session.verify_blocks(image, addrs, progress)
+        status.msg = "Uploaded OK"
+
+        if snapshot is not None:
+            snapshot = _apply_blocks(snapshot, image, addrs)
+            radio.radio_snapshot = snapshot
+            _IMAGE_SNAPSHOTS[_snapshot_key(radio)] = snapshot
+
+        # the radio is reset when leaving the session, even if nothing
+        # needed to be written
+        session.written = True
 
     return True
 
 
+# the parsed MEM_FORMAT is shared by every radio in the process and kept on
+# disk between runs, keyed by a hash of the format, the CHIRP version and
+# the source of its bitwise parser (source checkouts all report the same
+# version). A cache file that does not load is parsed again
+LAYOUT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache",
+                                "uvk5_egzumer")
+_LAYOUTS = {}
+_GRAMMAR_DIGEST = None
+
+
+def _grammar_digest():
+    """hash of the CHIRP version and the bitwise parser source files"""
+    global _GRAMMAR_DIGEST
+    if _GRAMMAR_DIGEST is None:
+        sha = hashlib.sha1(getattr(chirp, "CHIRP_VERSION", "").encode())
+        for module in (bitwise_grammar, bitwise):
+            try:
+                with open(module.__file__, "rb") as f:
+                    sha.update(f.read())
+            except (AttributeError, TypeError, OSError):
+                sha.update(module.__name__.encode())
+        _GRAMMAR_DIGEST = sha.hexdigest()
+    return _GRAMMAR_DIGEST
+
+
+def _mem_format_layout(spec):
+    """the parsed bitwise grammar for spec, only parsed once"""
+    key = spec + _grammar_digest()
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    layout = _LAYOUTS.get(digest)
+    if layout is not None:
+        return layout
+
+    path = os.path.join(LAYOUT_CACHE_DIR, "layout-%s.pickle" % digest)
+    try:
+        with open(path, "rb") as f:
+            layout = pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # truncated, from another Python or not ours: parse again
+        LOG.debug("Ignoring memory layout cache %s: %s", path, e)
+        layout = None
+
+    if layout is None:
+        layout = bitwise_grammar.parse(spec)
+        try:
+            os.makedirs(LAYOUT_CACHE_DIR, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(layout, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            LOG.debug("Not caching memory layout in %s: %s", path, e)
+
+    _LAYOUTS[digest] = layout
+    return layout
+
+
+def parse_mmap(mmap, spec=MEM_FORMAT):
+    """bitwise.parse(spec, mmap), reusing the cached parsed layout"""
+    return bitwise.Processor(mmap, 0).parse(_mem_format_layout(spec))
+
+
+class _LazySettingGroup(RadioSettingGroup):
+    """RadioSettingGroup filled in by build_fn the first time it is read"""
+
+    def __init__(self, name, shortname, build_fn):
+        super().__init__(name, shortname)
+        self._build_fn = build_fn
+
+    def is_built(self):
+        return self._build_fn is None
+
+    def _build(self):
+        if self._build_fn is not None:
+            build_fn, self._build_fn = self._build_fn, None
+            build_fn(self)
+
+    def __str__(self):
+        self._build()
+        return super().__str__()
+
+    def __iter__(self):
+        self._build()
+        return super().__iter__()
+
+    def __len__(self):
+        self._build()
+        return super().__len__()
+
+    def __getitem__(self, name):
+        self._build()
+        return super().__getitem__(name)
+
+    def items(self):
+        self._build()
+        return super().items()
+
+    def keys(self):
+        self._build()
+        return super().keys()
+
+    def values(self):
+        self._build()
+        return super().values()
+
+
+def _settings_changed(group):
+    """True if a setting of group has been edited since it was built"""
+    if isinstance(group, _LazySettingGroup) and not group.is_built():
+        return False
+    for element in group:
+        if isinstance(element, RadioSetting):
+            if element.changed():
+                return True
+        elif _settings_changed(element):
+            return True
+    return False
+
+
+def _band_index(bands):
+    """band ranges sorted by their lower edge, for bisect in find_band"""
+    ranges = sorted((rng[0], rng[1], bnd) for bnd, rng in bands.items())
+    return [rng[0] for rng in ranges], ranges
+
+
+BAND_INDEX = {
+    False: _band_index(BANDS_STANDARD),
+    True: _band_index(BANDS_WIDE),
+}
+
+
+def find_band(hz, wide=False):
+    """number of the band hz is in, False if the radio can't tune it"""
+    mhz = hz/1000000.0
+    starts, ranges = BAND_INDEX[bool(wide)]
+    idx = bisect.bisect_right(starts, mhz) - 1
+    # neighbouring bands may share an edge, the lower band gets it
+    while idx > 0 and ranges[idx-1][1] >= mhz:
+        idx -= 1
+    if idx < 0 or mhz > ranges[idx][1]:
+        return False
+    return ranges[idx][2]
+
+
 def min_max_def(value, min_val, max_val, default):
     """returns value if in bounds or default otherwise"""
     if min_val is not None and value < min_val:
@@ -758,6 +1596,267 @@ def list_def(value, lst, default):
         return default
     return value
 
+
+def _list_index(lst):
+    """encoder storing the position of the value in lst"""
+    return lambda value: lst.index(str(value))
+
+
+def _tens(value):
+    return int(int(value)/10)
+
+
+def _chars(length, pad="\x00", strip=str.rstrip):
+    """encoder for a fixed length char field"""
+    return lambda value: \
+        (strip(str(value), "\x20\xff\x00") + pad*length)[0:length]
+
+
+def _logo(value):
+    return _chars(12)(value) + "\x00\xff\xff\xff"
+
+
+def _password(value):
+    if value is None or value == "":
+        return 0xFFFFFFFF
+    return int(value)
+
+
+def _fm_freq(value):
+    try:
+        freq = int(float(str(value).strip())*10)
+    except Exception:
+        freq = 0xffff
+    if freq < FMMIN*10 or freq > FMMAX*10:
+        freq = 0xffff
+    return freq
+
+
+def _prior_channel(value):
+    value = int(value)
+    if value > 200 or value < 1:
+        return 0xff
+    return value - 1
+
+
+def _set_screen_channel(vfo):
+    """encoder for VFO_A_chn/VFO_B_chn, also sets the per mode channel"""
+    def encode(_mem, value):
+        screen = int(value)
+        setattr(_mem, "ScreenChannel_" + vfo, screen)
+        if screen < 200:
+            setattr(_mem, "MrChannel_" + vfo, screen)
+        elif screen < 207:
+            setattr(_mem, "FreqChannel_" + vfo, screen)
+        else:
+            setattr(_mem, "NoaaChannel_" + vfo, screen)
+    return encode
+
+
+def _set_vox(_mem, value):
+    voxvalue = VOX_LIST.index(str(value))
+    _mem.vox_switch = voxvalue > 0
+    _mem.vox_level = (voxvalue - 1) if _mem.vox_switch else 0
+
+
+def _set_rx_mode(_mem, value):
+    tmptxmode = RXMODE_LIST.index(str(value))
+    tmpmainvfo = _mem.TX_VFO + 1
+    _mem.crossband = tmpmainvfo * bool(tmptxmode & 0b10)
+    _mem.dual_watch = tmpmainvfo * bool(tmptxmode & 0b01)
+
+
+# set_settings dispatch table: setting name -> (field, encoder). field is
+# the path of the memory object the encoded value is stored in, settings
+# spread over several fields have field None and an encoder that takes
+# (_mem, value) and stores them itself
+SETTINGS_REGISTRY = {
+    # basic settings
+    "VFO_A_chn": (None, _set_screen_channel("A")),
+    "VFO_B_chn": (None, _set_screen_channel("B")),
+    "TX_VFO": (("TX_VFO",), _list_index(TX_VFO_LIST)),
+    "call_channel": (("call_channel",), lambda value: int(value)-1),
+    "squelch": (("squelch",), int),
+    "tot": (("max_talk_time",), _list_index(TALK_TIME_LIST)),
+    "noaa_autoscan": (("noaa_autoscan",), int),
+    "vox": (None, _set_vox),
+    "mic_gain": (("mic_gain",), int),
+    "channel_display_mode": (("channel_display_mode",),
+                             _list_index(CHANNELDISP_LIST)),
+    "rx_mode": (None, _set_rx_mode),
+    "battery_save": (("battery_save",), _list_index(BATSAVE_LIST)),
+    "backlight_time": (("backlight_time",), _list_index(BACKLIGHT_LIST)),
+    "backlight_min": (("backlight_min",), _list_index(BACKLIGHT_LVL_LIST)),
+    "backlight_max": (("backlight_max",), _list_index(BACKLIGHT_LVL_LIST)),
+    "backlight_on_TX_RX": (("backlight_on_TX_RX",),
+                           _list_index(BACKLIGHT_TX_RX_LIST)),
+    "AM_fix": (("AM_fix",), int),
+    "mic_bar": (("mic_bar",), int),
+    "battery_text": (("battery_text",), _list_index(BAT_TXT_LIST)),
+    "ste": (("ste",), int),
+    "freq_mode_allowed": (("freq_mode_allowed",), int),
+    "button_beep": (("button_beep",), int),
+    "scan_resume_mode": (("scan_resume_mode",),
+                         _list_index(SCANRESUME_LIST)),
+    "key_lock": (("key_lock",), int),
+    "auto_keypad_lock": (("auto_keypad_lock",), int),
+    "welcome_mode": (("power_on_dispmode",), _list_index(WELCOME_LIST)),
+    "voice": (("voice",), _list_index(VOICE_LIST)),
+    "s0_level": (("s0_level",), lambda value: -int(value)),
+    "s9_level": (("s9_level",), lambda value: -int(value)),
+    "password": (("password",), _password),
+    "alarm_mode": (("alarm_mode",), _list_index(ALARMMODE_LIST)),
+    "roger_beep": (("roger_beep",), _list_index(REMENDOFTALK_LIST)),
+    "rp_ste": (("rp_ste",), _list_index(RTE_LIST)),
+    "logo1": (("logo_line1",), _logo),
+    "logo2": (("logo_line2",), _logo),
+    "Battery_type": (("Battery_type",), _list_index(BATTYPE_LIST)),
+
+    # unlock settings
+    "int_flock": (("int_flock",), _list_index(FLOCK_LIST)),
+    "int_350tx": (("int_350tx",), int),
+    "int_KILLED": (("int_KILLED",), int),
+    "int_200tx": (("int_200tx",), int),
+    "int_500tx": (("int_500tx",), int),
+    "int_350en": (("int_350en",), int),
+    "int_scren": (("int_scren",), int),
+
+    # dtmf settings
+    "dtmf_side_tone": (("dtmf", "side_tone"), int),
+    "dtmf_separate_code": (("dtmf", "separate_code"), str),
+    "dtmf_group_call_code": (("dtmf", "group_call_code"), str),
+    "dtmf_decode_response": (("dtmf", "decode_response"),
+                             _list_index(DTMF_DECODE_RESPONSE_LIST)),
+    "dtmf_auto_reset_time": (("dtmf", "auto_reset_time"), _tens),
+    "dtmf_preload_time": (("dtmf", "preload_time"), _tens),
+    "dtmf_first_code_persist_time": (("dtmf", "first_code_persist_time"),
+                                     _tens),
+    "dtmf_hash_persist_time": (("dtmf", "hash_persist_time"), _tens),
+    "dtmf_code_persist_time": (("dtmf", "code_persist_time"), _tens),
+    "dtmf_code_interval_time": (("dtmf", "code_interval_time"), _tens),
+    "dtmf_permit_remote_kill": (("dtmf", "permit_remote_kill"), int),
+    "dtmf_dtmf_local_code": (("dtmf", "local_code"), _chars(3)),
+    "dtmf_dtmf_up_code": (("dtmf", "up_code"), _chars(16, strip=str.strip)),
+    "dtmf_dtmf_down_code": (("dtmf", "down_code"), _chars(16)),
+    "dtmf_kill_code": (("dtmf", "kill_code"), _chars(5, strip=str.strip)),
+    "dtmf_revive_code": (("dtmf", "revive_code"), _chars(5, strip=str.strip)),
+    "live_DTMF_decoder": (("live_DTMF_decoder",), int),
+
+    # scanlist stuff
+    "slDef": (("slDef",), _list_index(SCANLIST_SELECT_LIST)),
+    "sl1PriorEnab": (("sl1PriorEnab",), int),
+    "sl2PriorEnab": (("sl2PriorEnab",), int),
+    "sl1PriorCh1": (("sl1PriorCh1",), _prior_channel),
+    "sl1PriorCh2": (("sl1PriorCh2",), _prior_channel),
+    "sl2PriorCh1": (("sl2PriorCh1",), _prior_channel),
+    "sl2PriorCh2": (("sl2PriorCh2",), _prior_channel),
+
+    # programmable keys
+    "key1_shortpress_action": (("key1_shortpress_action",),
+                               _list_index(KEYACTIONS_LIST)),
+    "key1_longpress_action": (("key1_longpress_action",),
+                              _list_index(KEYACTIONS_LIST)),
+    "key2_shortpress_action": (("key2_shortpress_action",),
+                               _list_index(KEYACTIONS_LIST)),
+    "key2_longpress_action": (("key2_longpress_action",),
+                              _list_index(KEYACTIONS_LIST)),
+    "keyM_longpress_action": (("keyM_longpress_action",),
+                              _list_index(KEYACTIONS_LIST)),
+}
+
+# fm radio
+for _i in range(20):
+    SETTINGS_REGISTRY["FM_" + str(_i+1)] = (("fmfreq", _i), _fm_freq)
+
+# dtmf contacts
+for _i in range(16):
+    SETTINGS_REGISTRY["DTMF_" + str(_i+1)] = \
+        (("dtmfcontact", _i, "name"), _chars(8))
+    SETTINGS_REGISTRY["DTMFNUM_" + str(_i+1)] = \
+        (("dtmfcontact", _i, "number"), _chars(3, pad="\xff"))
+
+
+def _setting_values(settings, values):
+    """collect {name: value} of the settings set_settings has to store
+
+    Groups that were never built have not been shown or edited and are
+    skipped, calibration values are only taken when they were changed.
+    """
+    for element in settings:
+        if isinstance(element, RadioSetting):
+            name = element.get_name()
+            if name in SETTINGS_REGISTRY or \
+                    (name.startswith("_mem.cal.") and element.changed()):
+                values[name] = element.value.get_value()
+        elif not isinstance(element, _LazySettingGroup) or element.is_built():
+            _setting_values(element, values)
+    return values
+
+
+# calibration settings are named after their field, e.g.
+# "_mem.cal.txp[2].low.start"
+_CAL_SETTING = re.compile(r"_mem\.cal(?:\.[A-Za-z]\w*|\[\d+\])+")
+_CAL_PART = re.compile(r"\.(\w+)|\[(\d+)\]")
+
+
+def _calibration_field(name):
+    """the field path of a calibration setting name, None if it is not one"""
+    if not _CAL_SETTING.fullmatch(name):
+        return None
+    return tuple(int(idx) if idx else attr
+                 for attr, idx in _CAL_PART.findall(name[len("_mem"):]))
+
+
+class _RawChannel:
+    """
+    the channel, ch_attr and channelname fields of one memory read from
+    the raw image with the bitwise field names, so _decode_memory can use
+    it in place of the bitwise objects
+    """
+
+    __slots__ = ("freq", "offset", "rxcode", "txcode", "txcodeflag",
+                 "rxcodeflag", "modulation", "offsetDir", "busyChLockout",
+                 "txpower", "bandwidth", "freq_reverse", "dtmf_pttid",
+                 "dtmf_decode", "step", "scrambler", "is_scanlist1",
+                 "is_scanlist2", "compander", "is_free", "name")
+
+    def __init__(self, record, attr=0x0F, name=b""):
+        (self.freq, self.offset, self.rxcode, self.txcode, codeflags,
+         modulation, flags, dtmf, self.step, self.scrambler) = record
+        self.txcodeflag = codeflags >> 4
+        self.rxcodeflag = codeflags & 0x0F
+        self.modulation = modulation >> 4
+        self.offsetDir = modulation & 0x0F
+        self.busyChLockout = bool(flags & 0x10)
+        self.txpower = (flags >> 2) & 0x03
+        self.bandwidth = (flags >> 1) & 0x01
+        self.freq_reverse = bool(flags & 0x01)
+        self.dtmf_pttid = (dtmf >> 1) & 0x07
+        self.dtmf_decode = bool(dtmf & 0x01)
+        self.is_scanlist1 = attr >> 7
+        self.is_scanlist2 = (attr >> 6) & 0x01
+        self.compander = (attr >> 4) & 0x03
+        self.is_free = bool(attr & 0x08)
+        self.name = name.decode("latin-1")
+
+
+def _copy_memory(mem):
+    """
+    a copy of a cached memory the caller may edit: the scalar fields are
+    shared, the immutable list and the extra settings are new
+    """
+    new = copy.copy(mem)
+    new.immutable = list(mem.immutable)
+    extra = RadioSettingGroup(mem.extra.get_name(),
+                              mem.extra.get_shortname())
+    for setting in mem.extra:
+        extra.append(RadioSetting(setting.get_name(),
+                                  setting.get_shortname(),
+                                  copy.copy(setting.value)))
+    new.extra = extra
+    return new
+
+
 @directory.register
 class UVK5Radio(chirp_common.CloneModeRadio):
     """Quansheng UV-K5"""
@@ -768,15 +1867,18 @@ class UVK5Radio(chirp_common.CloneModeRadio):
     FIRMWARE_VERSION = ""
 
     upload_calibration = False
+    upload_incremental = False
+    upload_verify = False
+    download_window = DOWNLOAD_WINDOW
+    download_resume = True
+    adaptive_timeout = True
+    link_stats = None
+    radio_snapshot = None
+    cached_blocks = ()
+    _label_idx = 0
 
     def _find_band(self, hz):
-        mhz = hz/1000000.0
-        bands = BANDS_WIDE if self._memobj.BUILD_OPTIONS.ENABLE_WIDE_RX \
-                else BANDS_STANDARD
-        for bnd, rng in bands.items():
-            if rng[0] <= mhz <= rng[1]:
-                return bnd
-        return False
+        return find_band(hz, self._memobj.BUILD_OPTIONS.ENABLE_WIDE_RX)
 
     def _get_vfo_channel_names(self):
         """generates VFO_CHANNEL_NAMES"""
@@ -847,7 +1949,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
                                 "->Tone", "->DTCS", "DTCS->", "DTCS->DTCS"]
 
         rf.valid_characters = chirp_common.CHARSET_ASCII
-        rf.valid_modes = ["FM", "NFM", "AM", "NAM", "USB"]
+        rf.valid_modes = list(MODES_LIST)
 
         rf.valid_skips = [""]
 
@@ -872,13 +1974,21 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         self._mmap = do_download(self)
         self.process_mmap()
 
+    # Download only some regions (see MEM_RANGES) from the serial port,
+    # the rest of the image is kept from the last download
+    def sync_in_ranges(self, ranges):
+        self._mmap = do_download_ranges(self, ranges)
+        self.process_mmap()
+
     # Do an upload of the radio to the serial port
     def sync_out(self):
         do_upload(self)
 
     # Convert the raw byte array into a memory object structure
     def process_mmap(self):
-        self._memobj = bitwise.parse(MEM_FORMAT, self._mmap)
+        self._memobj = parse_mmap(self._mmap)
+        self._mem_cache = {}
+        self._settings_cache = {}
 
     # Return a raw representation of the memory object, which
     # is very helpful for development
@@ -887,7 +1997,12 @@ class UVK5Radio(chirp_common.CloneModeRadio):
 
     def validate_memory(self, mem):
         msgs = super().validate_memory(mem)
+        msgs.extend(self._band_warnings(
+            mem, self._memobj.BUILD_OPTIONS.ENABLE_WIDE_RX))
+        return msgs
 
+    def _band_warnings(self, mem, wide):
+        msgs = []
         if mem.duplex == 'off':
             return msgs
 
@@ -900,20 +2015,91 @@ class UVK5Radio(chirp_common.CloneModeRadio):
             txfreq = mem.freq
 
         # find band
-        band = self._find_band(txfreq)
+        band = find_band(txfreq, wide)
         if band is False:
             msg = f"Transmit frequency {txfreq/1000000.0:.4f}MHz " \
                    "is not supported by this radio"
             msgs.append(chirp_common.ValidationWarning(msg))
 
-        band = self._find_band(mem.freq)
+        band = find_band(mem.freq, wide)
         if band is False:
-            msg = f"The frequency {mem.freq/1000000.0:%.4f}MHz " \
+            msg = f"The frequency {mem.freq/1000000.0:.4f}MHz " \
                    "is not supported by this radio"
             msgs.append(chirp_common.ValidationWarning(msg))
 
         return msgs
 
+    def validate_memories(self, memories):
+        """
+        Check a list of memories in one pass, e.g. a large import, and
+        return {memory number: [messages]} for the ones with problems.
+        Covers frequency and transmit frequency bands, duplex, mode,
+        tuning step and tones; unlike validate_memory it does not call
+        get_features for every memory.
+        """
+        rf = self.get_features()
+        wide = self._memobj.BUILD_OPTIONS.ENABLE_WIDE_RX
+        duplexes = set(rf.valid_duplexes)
+        modes = set(rf.valid_modes)
+        steps = set(rf.valid_tuning_steps)
+        tmodes = set(rf.valid_tmodes)
+        cross_modes = set(rf.valid_cross_modes)
+        ctcss = set(CTCSS_TONES)
+        dtcs = set(DTCS_CODES)
+        lo, hi = rf.memory_bounds
+
+        def tone_errors(mem):
+            if mem.tmode == "Tone":
+                used = [("Tone", mem.rtone)]
+            elif mem.tmode == "TSQL":
+                used = [("Tone", mem.ctone)]
+            elif mem.tmode == "DTCS":
+                used = [("DTCS", mem.dtcs)]
+            elif mem.tmode == "Cross":
+                if mem.cross_mode not in cross_modes:
+                    return [f"Cross mode {mem.cross_mode} not supported"]
+                txmode, rxmode = mem.cross_mode.split("->")
+                used = [(txmode, mem.rtone if txmode == "Tone" else mem.dtcs),
+                        (rxmode,
+                         mem.ctone if rxmode == "Tone" else mem.rx_dtcs)]
+            elif mem.tmode in tmodes:
+                used = []
+            else:
+                return [f"Tone mode {mem.tmode} not supported"]
+
+            errs = []
+            for tmode, tone in used:
+                if tmode == "Tone" and tone not in ctcss:
+                    errs.append(f"Tone {tone} not supported")
+                elif tmode == "DTCS" and tone not in dtcs:
+                    errs.append(f"DTCS code {tone} not supported")
+            return errs
+
+        results = {}
+        for mem in memories:
+            if mem.empty:
+                continue
+
+            errs = []
+            if not lo <= mem.number <= hi and \
+                    mem.extd_number not in rf.valid_special_chans:
+                errs.append(f"Memory {mem.number} out of range")
+            if mem.duplex not in duplexes:
+                errs.append(f"Duplex {mem.duplex} not supported")
+            if mem.mode not in modes:
+                errs.append(f"Mode {mem.mode} not supported")
+            if mem.tuning_step not in steps:
+                errs.append(f"Tuning step {mem.tuning_step} not supported")
+            errs.extend(tone_errors(mem))
+
+            msgs = [chirp_common.ValidationError(err) for err in errs]
+            if mem.duplex in duplexes:
+                msgs.extend(self._band_warnings(mem, wide))
+            if msgs:
+                results[mem.number] = msgs
+
+        return results
+
     def _set_tone(self, mem, _mem):
         ((txmode, txtone, txpol),
          (rxmode, rxtone, rxpol)) = chirp_common.split_tone_encode(mem)
@@ -983,10 +2169,153 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         chirp_common.split_tone_decode(mem, (tx_tmode, tx_tone, tx_pol),
                                        (rx_tmode, rx_tone, rx_pol))
 
+    def _memory_key(self, number, image):
+        """
+        the raw bytes a memory is decoded from, so a cached memory is
+        never used once any of them has been written to
+        """
+        if isinstance(number, str):
+            ch_num = self._get_specials()[number]
+        else:
+            ch_num = number - 1
+        key = (number, image[ch_num*16:ch_num*16+16],
+               image[0x1FF0:0x1FF2])
+        if ch_num < 200:
+            key += (image[0xF50+ch_num*16:0xF50+ch_num*16+16],
+                    image[0xD60+ch_num])
+        return key
+
+    def _get_cached_memory(self, number, image, raw=None):
+        key = self._memory_key(number, image)
+        mem = self._mem_cache.get(key)
+        if mem is None:
+            if len(self._mem_cache) > MEM_CACHE_SIZE:
+                self._mem_cache.clear()
+            mem = self._decode_memory(number, raw)
+            self._mem_cache[key] = mem
+        # callers are free to edit what they get
+        return _copy_memory(mem)
+
     # Extract a high-level memory object from the low-level memory map
     # This is called to populate a memory in the UI
     def get_memory(self, number):
+        return self._get_cached_memory(number, self._mmap.get_packed())
+
+    def get_memories(self, lo=1, hi=200):
+        """
+        all memories from lo to hi (inclusive), decoded in one pass over
+        the raw channel records instead of through bitwise
+        """
+        if not 1 <= lo <= hi <= len(self._memobj.channel):
+            raise errors.InvalidMemoryLocation(
+                f"Memories {lo}-{hi} are not within "
+                f"1-{len(self._memobj.channel)}")
+        image = self._mmap.get_packed()
+        start = MEM_RANGES["channels"][0]
+        records = CHANNEL_STRUCT.iter_unpack(
+            image[start + (lo-1) * 16:start + hi * 16])
+        attrs = image[MEM_RANGES["ch_attr"][0]:MEM_RANGES["ch_attr"][1]]
+        names = MEM_RANGES["channel_names"][0]
+        mems = []
+        for ch_num, record in enumerate(records, lo - 1):
+            if ch_num < 200:
+                raw = _RawChannel(record, attrs[ch_num],
+                                  image[names + ch_num*16:
+                                        names + ch_num*16 + 16])
+            else:
+                raw = _RawChannel(record)
+            mems.append(self._get_cached_memory(ch_num + 1, image, raw))
+        return mems
 
+    # Bulk channel operations, working on whole slices of the channel,
+    # channelname and ch_attr arrays with one write per array instead of
+    # a set_memory per channel. Channels are numbered 1-200 like memories
+
+    def _check_channels(self, lo, hi):
+        if not 1 <= lo <= hi <= 200:
+            raise errors.InvalidMemoryLocation(
+                f"Channels {lo}-{hi} are not within 1-200")
+
+    def get_channel_block(self, lo, hi):
+        """
+        the raw records of channels lo to hi (inclusive), one bytes object
+        per CHANNEL_ARRAYS entry, to be stored with put_channel_block
+        """
+        self._check_channels(lo, hi)
+        image = self._mmap.get_packed()
+        return tuple(image[start + (lo-1) * size:start + hi * size]
+                     for start, size, _ in CHANNEL_ARRAYS)
+
+    def put_channel_block(self, lo, block):
+        """store a get_channel_block result from channel lo on"""
+        count = len(block[0]) // CHANNEL_ARRAYS[0][1]
+        self._check_channels(lo, lo + count - 1)
+        for (start, size, _), data in zip(CHANNEL_ARRAYS, block):
+            self._mmap[start + (lo-1) * size] = data
+
+    def clear_channels(self, lo, hi):
+        """erase channels lo to hi (inclusive) like an empty set_memory"""
+        self._check_channels(lo, hi)
+        self.put_channel_block(lo, tuple(erased * (hi - lo + 1)
+                                         for _, _, erased in CHANNEL_ARRAYS))
+
+    def copy_channels(self, lo, hi, dest, source=None):
+        """
+        copy channels lo to hi (inclusive) to dest onwards, from another
+        UVK5Radio (or opened image) if source is given. The ranges may
+        overlap
+        """
+        block = (source or self).get_channel_block(lo, hi)
+        self.put_channel_block(dest, block)
+
+    def move_channels(self, lo, hi, dest):
+        """move channels lo to hi (inclusive) to dest, clearing the rest"""
+        self.copy_channels(lo, hi, dest)
+        count = hi - lo + 1
+        for first, last in ((lo, min(hi, dest - 1)),
+                            (max(lo, dest + count), hi)):
+            if first <= last:
+                self.clear_channels(first, last)
+
+    def reorder_channels(self, order, lo=1):
+        """
+        rewrite the channels from lo on as the channels numbered in order,
+        e.g. order=[3, 1, 2] puts channel 3 at lo. Channels not listed
+        keep their place
+        """
+        if not order:
+            return
+        self._check_channels(min(order), max(order))
+        block = self.get_channel_block(1, 200)
+        self.put_channel_block(lo, tuple(
+            b"".join(data[(num-1) * size:num * size] for num in order)
+            for (_, size, _), data in zip(CHANNEL_ARRAYS, block)))
+
+    @staticmethod
+    def _channel_is_empty(channel, attr):
+        freq = struct.unpack("<I", channel[:4])[0]
+        return freq in (0, 0xFFFFFFFF) or attr & 0x08
+
+    def compact_channels(self, lo=1, hi=200):
+        """
+        close the gaps between the used channels lo to hi (inclusive),
+        keeping their order, returns the number of used channels
+        """
+        self._check_channels(lo, hi)
+        channels, _, attrs = self.get_channel_block(lo, hi)
+        used = [lo + idx for idx in range(hi - lo + 1)
+                if not self._channel_is_empty(channels[idx*16:idx*16+16],
+                                              attrs[idx])]
+        self.reorder_channels(used, lo)
+        if lo + len(used) <= hi:
+            self.clear_channels(lo + len(used), hi)
+        return len(used)
+
+    def _decode_memory(self, number, raw=None):
+        """
+        the Memory for number, from the bitwise objects or from raw, a
+        _RawChannel of the same channel
+        """
         mem = chirp_common.Memory()
 
         if isinstance(number, str):
@@ -997,7 +2326,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
 
         mem.number = ch_num + 1
 
-        _mem = self._memobj.channel[ch_num]
+        _mem = raw or self._memobj.channel[ch_num]
 
         is_empty = False
         # We'll consider any blank (i.e. 0MHz frequency) to be empty
@@ -1008,7 +2337,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         tmpscn = SCANLIST_LIST[0]
         tmp_comp = 0
         if ch_num < 200:
-            _mem3 = self._memobj.ch_attr[ch_num]
+            _mem3 = raw or self._memobj.ch_attr[ch_num]
             # free memory bit
             if _mem3.is_free:
                 is_empty = True
@@ -1063,7 +2392,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
             mem.name = self._get_vfo_channel_names()[ch_num-200]
             mem.immutable = ["name", "scanlists"]
         else:
-            _mem2 = self._memobj.channelname[ch_num]
+            _mem2 = raw or self._memobj.channelname[ch_num]
             for char in _mem2.name:
                 if str(char) == "\xFF" or str(char) == "\x00":
                     break
@@ -1093,7 +2422,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         self._get_tone(mem, _mem)
 
         # mode
-        temp_modes = self.get_features().valid_modes
+        temp_modes = MODES_LIST
         temp_modul = _mem.modulation*2 + _mem.bandwidth
         if temp_modul < len(temp_modes):
             mem.mode = temp_modes[temp_modul]
@@ -1165,407 +2494,91 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         return mem
 
     def set_settings(self, settings):
-        _mem = self._memobj
-        for element in settings:
-            if not isinstance(element, RadioSetting):
-                self.set_settings(element)
-                continue
-
-            elname = element.get_name()
-
-            # basic settings
+        self.apply_settings(_setting_values(settings, {}))
 
-            # VFO_A e80 ScreenChannel_A
-            if elname == "VFO_A_chn":
-                _mem.ScreenChannel_A = int(element.value)
-                if _mem.ScreenChannel_A < 200:
-                    _mem.MrChannel_A = _mem.ScreenChannel_A
-                elif _mem.ScreenChannel_A < 207:
-                    _mem.FreqChannel_A = _mem.ScreenChannel_A
-                else:
-                    _mem.NoaaChannel_A = _mem.ScreenChannel_A
-
-            # VFO_B e83
-            elif elname == "VFO_B_chn":
-                _mem.ScreenChannel_B = int(element.value)
-                if _mem.ScreenChannel_B < 200:
-                    _mem.MrChannel_B = _mem.ScreenChannel_B
-                elif _mem.ScreenChannel_B < 207:
-                    _mem.FreqChannel_B = _mem.ScreenChannel_B
-                else:
-                    _mem.NoaaChannel_B = _mem.ScreenChannel_B
-
-            # TX_VFO  channel selected A,B
-            elif elname == "TX_VFO":
-                _mem.TX_VFO = TX_VFO_LIST.index(str(element.value))
-
-            # call channel
-            elif elname == "call_channel":
-                _mem.call_channel = int(element.value)-1
-
-            # squelch
-            elif elname == "squelch":
-                _mem.squelch = int(element.value)
-
-            # TOT
-            elif elname == "tot":
-                _mem.max_talk_time = TALK_TIME_LIST.index(str(element.value))
-
-            # NOAA autoscan
-            elif elname == "noaa_autoscan":
-                _mem.noaa_autoscan = int(element.value)
-
-            # VOX
-            elif elname == "vox":
-                voxvalue = VOX_LIST.index(str(element.value))
-                _mem.vox_switch = voxvalue > 0
-                _mem.vox_level = (voxvalue - 1) if _mem.vox_switch else 0
-
-            # mic gain
-            elif elname == "mic_gain":
-                _mem.mic_gain = int(element.value)
-
-            # Channel display mode
-            elif elname == "channel_display_mode":
-                _mem.channel_display_mode = CHANNELDISP_LIST.index(
-                    str(element.value))
-
-            # RX Mode
-            elif elname == "rx_mode":
-                tmptxmode = RXMODE_LIST.index(str(element.value))
-                tmpmainvfo = _mem.TX_VFO + 1
-                _mem.crossband = tmpmainvfo * bool(tmptxmode & 0b10)
-                _mem.dual_watch = tmpmainvfo * bool(tmptxmode & 0b01)
-
-            # Battery Save
-            elif elname == "battery_save":
-                _mem.battery_save = BATSAVE_LIST.index(str(element.value))
-
-            # Backlight auto mode
-            elif elname == "backlight_time":
-                _mem.backlight_time = BACKLIGHT_LIST.index(str(element.value))
-
-            # Backlight min
-            elif elname == "backlight_min":
-                _mem.backlight_min = \
-                        BACKLIGHT_LVL_LIST.index(str(element.value))
-
-            # Backlight max
-            elif elname == "backlight_max":
-                _mem.backlight_max = \
-                        BACKLIGHT_LVL_LIST.index(str(element.value))
-
-            # Backlight TX_RX
-            elif elname == "backlight_on_TX_RX":
-                _mem.backlight_on_TX_RX = \
-                        BACKLIGHT_TX_RX_LIST.index(str(element.value))
-            # AM_fix
-            elif elname == "AM_fix":
-                _mem.AM_fix = int(element.value)
-
-            # mic_bar
-            elif elname == "mem.mic_bar":
-                _mem.mic_bar = int(element.value)
-
-             # Batterie txt
-            elif elname == "_mem.battery_text":
-                _mem.battery_text = \
-                        BAT_TXT_LIST.index(str(element.value))
-
-            # Tail tone elimination
-            elif elname == "ste":
-                _mem.ste = int(element.value)
-
-            # VFO Open
-            elif elname == "freq_mode_allowed":
-                _mem.freq_mode_allowed = int(element.value)
-
-             # Beep control
-            elif elname == "button_beep":
-                _mem.button_beep = int(element.value)
-
-            # Scan resume mode
-            elif elname == "scan_resume_mode":
-                _mem.scan_resume_mode = SCANRESUME_LIST.index(
-                    str(element.value))
-
-            # Keypad lock
-            elif elname == "key_lock":
-                _mem.key_lock = int(element.value)
-
-            # Auto keypad lock
-            elif elname == "auto_keypad_lock":
-                _mem.auto_keypad_lock = int(element.value)
-
-            # Power on display mode
-            elif elname == "welcome_mode":
-                _mem.power_on_dispmode = WELCOME_LIST.index(str(element.value))
-
-            # Keypad Tone
-            elif elname == "voice":
-                _mem.voice = VOICE_LIST.index(str(element.value))
-
-            elif elname == "s0_level":
-                _mem.s0_level = -int(element.value)
-
-            elif elname == "s9_level":
-                _mem.s9_level = -int(element.value)
-
-            elif elname == "password":
-                if element.value.get_value() is None or element.value == "":
-                    _mem.password = 0xFFFFFFFF
-                else:
-                    _mem.password = int(element.value)
-
-            # Alarm mode
-            elif elname == "alarm_mode":
-                _mem.alarm_mode = ALARMMODE_LIST.index(str(element.value))
-
-            # Reminding of end of talk
-            elif elname == "roger_beep":
-                _mem.roger_beep = REMENDOFTALK_LIST.index(str(element.value))
-
-            # Repeater tail tone elimination
-            elif elname == "rp_ste":
-                _mem.rp_ste = RTE_LIST.index(
-                    str(element.value))
-
-            # Logo string 1
-            elif elname == "logo1":
-                bts = str(element.value).rstrip("\x20\xff\x00")+"\x00"*12
-                _mem.logo_line1 = bts[0:12]+"\x00\xff\xff\xff"
-
-            # Logo string 2
-            elif elname == "logo2":
-                bts = str(element.value).rstrip("\x20\xff\x00")+"\x00"*12
-                _mem.logo_line2 = bts[0:12]+"\x00\xff\xff\xff"
-
-            # unlock settings
-
-            # FLOCK
-            elif elname == "int_flock":
-                _mem.int_flock = FLOCK_LIST.index(str(element.value))
-
-            # 350TX
-            elif elname == "int_350tx":
-                _mem.int_350tx = int(element.value)
-
-            # KILLED
-            elif elname == "int_KILLED":
-                _mem.int_KILLED = int(element.value)
-
-            # 200TX
-            elif elname == "int_200tx":
-                _mem.int_200tx = int(element.value)
-
-            # 500TX
-            elif elname == "int_500tx":
-                _mem.int_500tx = int(element.value)
-
-            # 350EN
-            elif elname == "int_350en":
-                _mem.int_350en = int(element.value)
-
-            # SCREN
-            elif elname == "int_scren":
-                _mem.int_scren = int(element.value)
-
-            # battery type
-            elif elname == "Battery_type":
-                _mem.Battery_type = BATTYPE_LIST.index(str(element.value))
-            # fm radio
-            for i in range(1, 21):
-                freqname = "FM_" + str(i)
-                if elname == freqname:
-                    val = str(element.value).strip()
-                    try:
-                        val2 = int(float(val)*10)
-                    except Exception:
-                        val2 = 0xffff
-
-                    if val2 < FMMIN*10 or val2 > FMMAX*10:
-                        val2 = 0xffff
-#                        raise errors.InvalidValueError(
-#                                "FM radio frequency should be a value "
-#                                "in the range %.1f - %.1f" % (FMMIN , FMMAX))
-                    _mem.fmfreq[i-1] = val2
-
-            # dtmf settings
-            if elname == "dtmf_side_tone":
-                _mem.dtmf.side_tone = \
-                        int(element.value)
-
-            elif elname == "dtmf_separate_code":
-                _mem.dtmf.separate_code = str(element.value)
-
-            elif elname == "dtmf_group_call_code":
-                _mem.dtmf.group_call_code = element.value
-
-            elif elname == "dtmf_decode_response":
-                _mem.dtmf.decode_response = \
-                        DTMF_DECODE_RESPONSE_LIST.index(str(element.value))
-
-            elif elname == "dtmf_auto_reset_time":
-                _mem.dtmf.auto_reset_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_preload_time":
-                _mem.dtmf.preload_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_first_code_persist_time":
-                _mem.dtmf.first_code_persist_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_hash_persist_time":
-                _mem.dtmf.hash_persist_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_code_persist_time":
-                _mem.dtmf.code_persist_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_code_interval_time":
-                _mem.dtmf.code_interval_time = \
-                        int(int(element.value)/10)
-
-            elif elname == "dtmf_permit_remote_kill":
-                _mem.dtmf.permit_remote_kill = \
-                        int(element.value)
-
-            elif elname == "dtmf_dtmf_local_code":
-                k = str(element.value).rstrip("\x20\xff\x00") + "\x00"*3
-                _mem.dtmf.local_code = k[0:3]
-
-            elif elname == "dtmf_dtmf_up_code":
-                k = str(element.value).strip("\x20\xff\x00") + "\x00"*16
-                _mem.dtmf.up_code = k[0:16]
-
-            elif elname == "dtmf_dtmf_down_code":
-                k = str(element.value).rstrip("\x20\xff\x00") + "\x00"*16
-                _mem.dtmf.down_code = k[0:16]
-
-            elif elname == "dtmf_kill_code":
-                k = str(element.value).strip("\x20\xff\x00") + "\x00"*5
-                _mem.dtmf.kill_code = k[0:5]
-
-            elif elname == "dtmf_revive_code":
-                k = str(element.value).strip("\x20\xff\x00") + "\x00"*5
-                _mem.dtmf.revive_code = k[0:5]
-
-            elif elname == "live_DTMF_decoder":
-                _mem.live_DTMF_decoder = int(element.value)
-
-            # dtmf contacts
-            for i in range(1, 17):
-                varname = "DTMF_" + str(i)
-                if elname == varname:
-                    k = str(element.value).rstrip("\x20\xff\x00") + "\x00"*8
-                    _mem.dtmfcontact[i-1].name = k[0:8]
-
-                varnumname = "DTMFNUM_" + str(i)
-                if elname == varnumname:
-                    k = str(element.value).rstrip("\x20\xff\x00") + "\xff"*3
-                    _mem.dtmfcontact[i-1].number = k[0:3]
-
-            # scanlist stuff
-            if elname == "slDef":
-                _mem.slDef = SCANLIST_SELECT_LIST.index(
-                        str(element.value))
-
-            elif elname == "sl1PriorEnab":
-                _mem.sl1PriorEnab = \
-                        int(element.value)
-
-            elif elname == "sl2PriorEnab":
-                _mem.sl2PriorEnab = \
-                        int(element.value)
-
-            elif elname == "sl1PriorCh1" or \
-                    elname == "sl1PriorCh2" or \
-                    elname == "sl2PriorCh1" or \
-                    elname == "sl2PriorCh2":
-
-                val = int(element.value)
-
-                if val > 200 or val < 1:
-                    val = 0xff
-                else:
-                    val -= 1
-
-                if elname == "sl1PriorCh1":
-                    _mem.sl1PriorCh1 = val
-                if elname == "sl1PriorCh2":
-                    _mem.sl1PriorCh2 = val
-                if elname == "sl2PriorCh1":
-                    _mem.sl2PriorCh1 = val
-                if elname == "sl2PriorCh2":
-                    _mem.sl2PriorCh2 = val
-
-            if elname == "key1_shortpress_action":
-                _mem.key1_shortpress_action = KEYACTIONS_LIST.index(
-                        str(element.value))
-
-            elif elname == "key1_longpress_action":
-                _mem.key1_longpress_action = KEYACTIONS_LIST.index(
-                        str(element.value))
-
-            elif elname == "key2_shortpress_action":
-                _mem.key2_shortpress_action = KEYACTIONS_LIST.index(
-                        str(element.value))
-
-            elif elname == "key2_longpress_action":
-                _mem.key2_longpress_action = KEYACTIONS_LIST.index(
-                        str(element.value))
-
-            elif elname == "keyM_longpress_action":
-                _mem.keyM_longpress_action = KEYACTIONS_LIST.index(
-                        str(element.value))
+    def apply_settings(self, values):
+        """store {setting name: value} in the memory map
 
+        Applies a settings profile without going through RadioSetting
+        objects, e.g. the same template to many images. Every name is one
+        SETTINGS_REGISTRY lookup, calibration fields are named by their
+        path below _mem.cal, unknown names are ignored.
+        """
+        _mem = self._memobj
+        for name, value in values.items():
+            entry = SETTINGS_REGISTRY.get(name)
+            if entry is None:
+                field = _calibration_field(name)
+                if field is None:
+                    continue
+                entry = field, lambda value: value
+
+            field, encode = entry
+            if field is None:
+                encode(_mem, value)
+                continue
 
-            elif element.changed() and elname.startswith("_mem.cal."):
-                exec(elname + " = element.value.get_value()")
+            obj = _mem
+            for key in field[:-1]:
+                obj = obj[key] if isinstance(key, int) else getattr(obj, key)
+            key = field[-1]
+            if isinstance(key, int):
+                obj[key] = encode(value)
+            else:
+                setattr(obj, key, encode(value))
 
+    def _append_label(self, radio_setting, label, descr=""):
+        val = RadioSettingValueString(len(descr), len(descr), descr)
+        val.set_mutable(False)
+        rs = RadioSetting("label" + str(self._label_idx), label, val)
+        self._label_idx += 1
+        radio_setting.append(rs)
 
     def get_settings(self):
         _mem = self._memobj
-        basic = RadioSettingGroup("basic", "Basic Settings")
-        advanced = RadioSettingGroup("advanced", "Advanced Settings")
-        keya = RadioSettingGroup("keya", "Programmable Keys")
-        dtmf = RadioSettingGroup("dtmf", "DTMF Settings")
-        dtmfc = RadioSettingGroup("dtmfc", "DTMF Contacts")
-        scanl = RadioSettingGroup("scn", "Scan Lists")
-        unlock = RadioSettingGroup("unlock", "Unlock Settings")
-        fmradio = RadioSettingGroup("fmradio", "FM Radio")
-        calibration = RadioSettingGroup("calibration", "Calibration")
-
-        roinfo = RadioSettingGroup("roinfo", "Driver Information")
-        top = RadioSettings()
-        top.append(basic)
-        top.append(advanced)
-        top.append(keya)
-        top.append(dtmf)
+        groups = [
+            ("basic", "Basic Settings", self._get_basic_settings),
+            ("advanced", "Advanced Settings", self._get_advanced_settings),
+            ("keya", "Programmable Keys", self._get_keya_settings),
+            ("dtmf", "DTMF Settings", self._get_dtmf_settings),
+        ]
         if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
-            top.append(dtmfc)
-        top.append(scanl)
-        top.append(unlock)
+            groups.append(("dtmfc", "DTMF Contacts",
+                           self._get_dtmfc_settings))
+        groups.append(("scn", "Scan Lists", self._get_scanlist_settings))
+        groups.append(("unlock", "Unlock Settings",
+                       self._get_unlock_settings))
         if _mem.BUILD_OPTIONS.ENABLE_FMRADIO:
-            top.append(fmradio)
-        top.append(roinfo)
-        top.append(calibration)
-
-        # helper function
-        def append_label(radio_setting, label, descr = ""):
-            if not hasattr(append_label, 'idx'):
-                append_label.idx = 0
-
-            val = RadioSettingValueString(len(descr), len(descr), descr)
-            val.set_mutable(False)
-            rs = RadioSetting("label" + str(append_label.idx), label, val)
-            append_label.idx += 1
-            radio_setting.append(rs)
-
-        # Programmable keys
+            groups.append(("fmradio", "FM Radio",
+                           self._get_fmradio_settings))
+        groups.append(("roinfo", "Driver Information",
+                       self._get_roinfo_settings))
+        groups.append(("calibration", "Calibration",
+                       self._get_calibration_settings))
+
+        # a group is only built when the UI first looks into it, and is
+        # handed out again until the eeprom bytes it shows change or one
+        # of its settings has been edited
+        image = self._mmap.get_packed()
+        state = (self.FIRMWARE_VERSION, self.upload_calibration,
+                 self.upload_incremental, self.upload_verify)
+        top = RadioSettings()
+        for name, shortname, build_fn in groups:
+            key = state + tuple(image[start:end]
+                                for start, end in SETTINGS_RANGES[name])
+            cached = self._settings_cache.get(name)
+            if cached is None or cached[0] != key or \
+                    _settings_changed(cached[1]):
+                cached = (key, _LazySettingGroup(name, shortname, build_fn))
+                self._settings_cache[name] = cached
+            top.append(cached[1])
+
+        return top
+
+    def _get_keya_settings(self, keya):
+        """Programmable keys"""
+        _mem = self._memobj
+
         def get_action(action_num):
             """"get actual key action"""
             has_alarm = self._memobj.BUILD_OPTIONS.ENABLE_ALARM
@@ -1610,8 +2623,9 @@ class UVK5Radio(chirp_common.CloneModeRadio):
                           "Menu key long press (M Long)", val)
         keya.append(rs)
 
-
-################## DTMF settings
+    def _get_dtmf_settings(self, dtmf):
+        """DTMF settings"""
+        _mem = self._memobj
 
         tmpval = str(_mem.dtmf.separate_code)
         if tmpval not in DTMF_CODE_CHARS:
@@ -1752,9 +2766,33 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         val = RadioSettingValueBoolean(_mem.int_KILLED)
         killed_setting = RadioSetting("int_KILLED", "DTMF kill lock", val)
 
-################## DTMF Contacts
+        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
+            dtmf.append(sep_code_setting)
+            dtmf.append(group_code_setting)
+        dtmf.append(first_code_per_setting)
+        dtmf.append(spec_per_setting)
+        dtmf.append(code_per_setting)
+        dtmf.append(code_int_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
+            dtmf.append(ani_id_setting)
+        dtmf.append(up_code_setting)
+        dtmf.append(dw_code_setting)
+        dtmf.append(d_prel_setting)
+        dtmf.append(dtmf_side_tone_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
+            dtmf.append(dtmf_resp_setting)
+            dtmf.append(d_hold_setting)
+            dtmf.append(d_live_setting)
+            dtmf.append(perm_kill_setting)
+            dtmf.append(kill_code_setting)
+            dtmf.append(rev_code_setting)
+            dtmf.append(killed_setting)
 
-        append_label(dtmfc, "DTMF Contacts  (D List)",
+    def _get_dtmfc_settings(self, dtmfc):
+        """DTMF contacts"""
+        _mem = self._memobj
+
+        self._append_label(dtmfc, "DTMF Contacts  (D List)",
                     "All DTMF Contacts are 3 codes "
                     "(valid: 0-9 * # ABCD), "
                     "or an empty string")
@@ -1777,7 +2815,9 @@ class UVK5Radio(chirp_common.CloneModeRadio):
             rs = RadioSetting(varnumname, varinumdescr, val)
             dtmfc.append(rs)
 
-################## Scan Lists
+    def _get_scanlist_settings(self, scanl):
+        """Scan lists"""
+        _mem = self._memobj
 
         tmpscanl = list_def(_mem.slDef, SCANLIST_SELECT_LIST, 0)
         val = RadioSettingValueList(SCANLIST_SELECT_LIST, None, tmpscanl)
@@ -1818,7 +2858,9 @@ class UVK5Radio(chirp_common.CloneModeRadio):
                           "Scanlist 2 priority channel 2 (0 - OFF)", val)
         scanl.append(rs)
 
-################## Basic settings
+    def _get_basic_settings(self, basic):
+        """Basic settings"""
+        _mem = self._memobj
 
         ch_list = []
         for ch in range(1, 201):
@@ -1963,10 +3005,6 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         val = RadioSettingValueList(RXMODE_LIST, None, tmprxmode)
         rx_mode_setting = RadioSetting("rx_mode", "RX Mode (RxMode)", val)
 
-        val = RadioSettingValueBoolean(_mem.freq_mode_allowed)
-        freq_mode_allowed_setting = RadioSetting("freq_mode_allowed",
-                                                 "Frequency mode allowed", val)
-
         tmpscanres = list_def(_mem.scan_resume_mode, SCANRESUME_LIST, 0)
         val = RadioSettingValueList(SCANRESUME_LIST, None, tmpscanres)
         scn_rev_setting = RadioSetting("scan_resume_mode",
@@ -1980,7 +3018,65 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         val = RadioSettingValueList(ALARMMODE_LIST, None, tmpalarmmode)
         alarm_setting = RadioSetting("alarm_mode", "Alarm mode", val)
 
-################## Extra settings
+        basic.append(squelch_setting)
+        basic.append(rx_mode_setting)
+        basic.append(call_channel_setting)
+        basic.append(auto_keypad_lock_setting)
+        basic.append(tx_t_out_setting)
+        basic.append(bat_save_setting)
+        basic.append(scn_rev_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_NOAA:
+            basic.append(noaa_auto_scan_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_AM_FIX:
+            basic.append(am_fix_setting)
+
+        self._append_label(basic,
+                     "=" * 6 + " Display settings " + "=" * 300, "=" * 300)
+
+        basic.append(bat_txt_setting)
+        basic.append(mic_bar_setting)
+        basic.append(ch_disp_setting)
+        basic.append(p_on_msg_setting)
+        basic.append(logo1_setting)
+        basic.append(logo2_setting)
+
+        self._append_label(basic,
+                     "=" * 6 + " Backlight settings " + "=" * 300, "=" * 300)
+
+        basic.append(back_lt_setting)
+        basic.append(bl_min_setting)
+        basic.append(bl_max_setting)
+        basic.append(blt_trx_setting)
+
+        self._append_label(basic,
+                    "=" * 6 + " Audio related settings " + "=" * 300, "=" * 300)
+
+        if _mem.BUILD_OPTIONS.ENABLE_VOX:
+            basic.append(vox_setting)
+        basic.append(mic_gain_setting)
+        basic.append(beep_setting)
+        basic.append(roger_setting)
+        basic.append(ste_setting)
+        basic.append(rp_ste_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_VOICE:
+            basic.append(voice_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_ALARM:
+            basic.append(alarm_setting)
+
+        self._append_label(basic, "=" * 6 + " Radio state " + "=" * 300, "=" * 300)
+
+        basic.append(freq0_setting)
+        basic.append(freq1_setting)
+        basic.append(tx_vfo_setting)
+        basic.append(keypad_cock_setting)
+
+    def _get_advanced_settings(self, advanced):
+        """Advanced settings"""
+        _mem = self._memobj
+
+        val = RadioSettingValueBoolean(_mem.freq_mode_allowed)
+        freq_mode_allowed_setting = RadioSetting("freq_mode_allowed",
+                                                 "Frequency mode allowed", val)
 
         # S-meter
         tmp_s0 = -int(_mem.s0_level)
@@ -2004,6 +3100,26 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         bat_type_setting = RadioSetting("Battery_type",
                                         "Battery Type (BatTyp)", val)
 
+        # Incremental upload
+        val = RadioSettingValueBoolean(self.upload_incremental)
+        def validate_upload_incremental(value):
+            self.upload_incremental = value
+            return value
+
+        val.set_validate_callback(validate_upload_incremental)
+        upload_incremental_setting = RadioSetting("upload_incremental",
+            "Upload only blocks changed since download", val)
+
+        # Verify upload
+        val = RadioSettingValueBoolean(self.upload_verify)
+        def validate_upload_verify(value):
+            self.upload_verify = value
+            return value
+
+        val.set_validate_callback(validate_upload_verify)
+        upload_verify_setting = RadioSetting("upload_verify",
+            "Verify upload by reading it back", val)
+
         # Power on password
         def validate_password(value):
             value = value.strip(" ")
@@ -2020,9 +3136,20 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         val.set_validate_callback(validate_password)
         pswd_setting = RadioSetting("password", "Power on password", val)
 
-################## FM radio
+        advanced.append(freq_mode_allowed_setting)
+        advanced.append(bat_type_setting)
+        advanced.append(upload_incremental_setting)
+        advanced.append(upload_verify_setting)
+        advanced.append(s0_level_setting)
+        advanced.append(s9_level_setting)
+        if _mem.BUILD_OPTIONS.ENABLE_PWRON_PASSWORD:
+            advanced.append(pswd_setting)
+
+    def _get_fmradio_settings(self, fmradio):
+        """FM radio"""
+        _mem = self._memobj
 
-        append_label(fmradio, "Channel", "Frequency [MHz]")
+        self._append_label(fmradio, "Channel", "Frequency [MHz]")
 
         for i in range(1, 21):
             fmfreq = _mem.fmfreq[i-1]/10.0
@@ -2033,7 +3160,9 @@ class UVK5Radio(chirp_common.CloneModeRadio):
                                 RadioSettingValueString(0, 5, freq_name))
             fmradio.append(rs)
 
-################## Unlock settings
+    def _get_unlock_settings(self, unlock):
+        """Unlock settings"""
+        _mem = self._memobj
 
         # F-LOCK
         def validate_int_flock( value):
@@ -2069,21 +3198,33 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         en_scrambler_setting = RadioSetting("int_scren",
                                             "Scrambler enabled (ScraEn)", val)
 
+        unlock.append(f_lock_setting)
+        unlock.append(tx200_setting)
+        unlock.append(tx350_setting)
+        unlock.append(tx500_setting)
+        unlock.append(en350_setting)
+        unlock.append(en_scrambler_setting)
 
-################## Driver Info
-
+    def _get_roinfo_settings(self, roinfo):
+        """Driver info"""
         if self.FIRMWARE_VERSION == "":
             firmware = "To get the firmware version please download" \
                        "the image from the radio first"
         else:
             firmware = self.FIRMWARE_VERSION
 
-        append_label(roinfo, "Firmware Version", firmware)
-        append_label(roinfo, "Driver version", DRIVER_VERSION)
-
-################## Calibration
+        self._append_label(roinfo, "Firmware Version", firmware)
+        self._append_label(roinfo, "Driver version", DRIVER_VERSION)
 
+    def _calibration_value(self, name):
+        """the calibration field a "_mem.cal..." setting is named after"""
+        obj = self._memobj
+        for key in _calibration_field(name):
+            obj = obj[key] if isinstance(key, int) else getattr(obj, key)
+        return obj
 
+    def _get_calibration_settings(self, calibration):
+        """Calibration"""
         val = RadioSettingValueBoolean(False)
         def validate_upload_calibration(value):
             if value and not self.upload_calibration:
@@ -2110,45 +3251,45 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         bands = {"sqlBand1_3": "Frequency Band 1-3",
                  "sqlBand4_7": "Frequency Band 4-7"}
         for bnd, bndn in bands.items():
-            append_label(radio_setting_group,
+            self._append_label(radio_setting_group,
                          "=" * 6 + " " + bndn + " " + "=" * 300, "=" * 300)
             for sql in range(0, 10):
                 prefix = "_mem.cal." + bnd + "."
                 postfix = "[" + str(sql) + "]"
-                append_label(radio_setting_group, "Squelch " + str(sql))
+                self._append_label(radio_setting_group, "Squelch " + str(sql))
 
                 name = prefix + "openRssiThr" + postfix
-                tempval = min_max_def(eval(name), 0, 255, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 255, 0)
                 val = RadioSettingValueInteger(0, 255, tempval)
                 radio_setting = RadioSetting(name, "RSSI threshold open", val)
                 radio_setting_group.append(radio_setting)
 
                 name = prefix + "closeRssiThr" + postfix
-                tempval = min_max_def(eval(name), 0, 255, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 255, 0)
                 val = RadioSettingValueInteger(0, 255, tempval)
                 radio_setting = RadioSetting(name, "RSSI threshold close", val)
                 radio_setting_group.append(radio_setting)
 
                 name = prefix + "openNoiseThr" + postfix
-                tempval = min_max_def(eval(name), 0, 127, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 127, 0)
                 val = RadioSettingValueInteger(0, 127, tempval)
                 radio_setting = RadioSetting(name, "Noise threshold open", val)
                 radio_setting_group.append(radio_setting)
 
                 name = prefix + "closeNoiseThr" + postfix
-                tempval = min_max_def(eval(name), 0, 127, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 127, 0)
                 val = RadioSettingValueInteger(0, 127, tempval)
                 radio_setting = RadioSetting(name, "Noise threshold close", val)
                 radio_setting_group.append(radio_setting)
 
                 name = prefix + "openGlitchThr" + postfix
-                tempval = min_max_def(eval(name), 0, 255, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 255, 0)
                 val = RadioSettingValueInteger(0, 255, tempval)
                 radio_setting = RadioSetting(name, "Glitch threshold open", val)
                 radio_setting_group.append(radio_setting)
 
                 name = prefix + "closeGlitchThr" + postfix
-                tempval = min_max_def(eval(name), 0, 255, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 255, 0)
                 val = RadioSettingValueInteger(0, 255, tempval)
                 radio_setting = RadioSetting(name, "Glitch threshold close",
                                              val)
@@ -2162,13 +3303,13 @@ class UVK5Radio(chirp_common.CloneModeRadio):
 
         bands = {"rssiLevelsBands1_2": "1-2 ", "rssiLevelsBands3_7": "3-7 "}
         for bnd, bndn in bands.items():
-            append_label(radio_setting_group,
+            self._append_label(radio_setting_group,
                          "=" * 6 +
                          " RSSI levels for QS original small bar graph, bands "
                          + bndn + "=" * 300, "=" * 300)
             for lvl in [1, 2, 4, 6]:
                 name = "_mem.cal." + bnd + ".level" + str(lvl)
-                tempval = min_max_def(eval(name), 0, 65535, 0)
+                tempval = min_max_def(self._calibration_value(name), 0, 65535, 0)
                 val = RadioSettingValueInteger(0, 65535, tempval)
                 radio_setting = RadioSetting(name, "Level " + str(lvl), val)
                 radio_setting_group.append(radio_setting)
@@ -2180,15 +3321,15 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         calibration.append(radio_setting_group)
 
         for bnd in range(0,7):
-            append_label(radio_setting_group, "=" * 6 + " TX power band "
+            self._append_label(radio_setting_group, "=" * 6 + " TX power band "
                          + str(bnd+1) + " " + "=" * 300, "=" * 300)
             powers = {"low": "Low", "mid": "Medium", "hi": "High"}
             for pwr, pwrn in powers.items():
-                append_label(radio_setting_group, pwrn)
+                self._append_label(radio_setting_group, pwrn)
                 bounds = ["lower", "center", "upper"]
                 for bound in bounds:
                     name = "_mem.cal.txp[" + str(bnd) + "]." + pwr + "." + bound
-                    tempval = min_max_def(eval(name), 0, 255, 0)
+                    tempval = min_max_def(self._calibration_value(name), 0, 255, 0)
                     val = RadioSettingValueInteger(0, 255, tempval)
                     radio_setting = RadioSetting(name, bound.capitalize(), val)
                     radio_setting_group.append(radio_setting)
@@ -2201,7 +3342,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
 
         for lvl in range(0,6):
             name = "_mem.cal.batLvl[" + str(lvl) + "]"
-            temp_val = min_max_def(eval(name), 0, 4999, 4999)
+            temp_val = min_max_def(self._calibration_value(name), 0, 4999, 4999)
             val = RadioSettingValueInteger(0, 4999, temp_val)
             radio_setting = RadioSetting(name,
                 "Level " + str(lvl) +
@@ -2214,15 +3355,15 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         calibration.append(radio_setting_group)
 
         for lvl in range(0,10):
-            append_label(radio_setting_group, "Level " + str(lvl + 1))
+            self._append_label(radio_setting_group, "Level " + str(lvl + 1))
 
             name = "_mem.cal.vox1Thr[" + str(lvl) + "]"
-            val = RadioSettingValueInteger(0, 65535, eval(name))
+            val = RadioSettingValueInteger(0, 65535, self._calibration_value(name))
             radio_setting = RadioSetting(name, "On", val)
             radio_setting_group.append(radio_setting)
 
             name = "_mem.cal.vox0Thr[" + str(lvl) + "]"
-            val = RadioSettingValueInteger(0, 65535, eval(name))
+            val = RadioSettingValueInteger(0, 65535, self._calibration_value(name))
             radio_setting = RadioSetting(name, "Off", val)
             radio_setting_group.append(radio_setting)
 
@@ -2234,7 +3375,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
 
         for lvl in range(0,5):
             name = "_mem.cal.micLevel[" + str(lvl) + "]"
-            tempval = min_max_def(eval(name), 0, 31, 31)
+            tempval = min_max_def(self._calibration_value(name), 0, 31, 31)
             val = RadioSettingValueInteger(0, 31, tempval)
             radio_setting = RadioSetting(name, "Level " + str(lvl), val)
             radio_setting_group.append(radio_setting)
@@ -2244,115 +3385,23 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         calibration.append(radio_setting_group)
 
         name = "_mem.cal.xtalFreqLow"
-        temp_val = min_max_def(eval(name), -1000, 1000, 0)
+        temp_val = min_max_def(self._calibration_value(name), -1000, 1000, 0)
         val = RadioSettingValueInteger(-1000, 1000, temp_val)
         radio_setting = RadioSetting(name, "Xtal frequecy low", val)
         radio_setting_group.append(radio_setting)
 
         name = "_mem.cal.volumeGain"
-        temp_val = min_max_def(eval(name), 0, 63, 58)
+        temp_val = min_max_def(self._calibration_value(name), 0, 63, 58)
         val = RadioSettingValueInteger(0, 63, temp_val)
         radio_setting = RadioSetting(name, "Volume gain", val)
         radio_setting_group.append(radio_setting)
 
         name = "_mem.cal.dacGain"
-        temp_val = min_max_def(eval(name), 0, 15, 8)
+        temp_val = min_max_def(self._calibration_value(name), 0, 15, 8)
         val = RadioSettingValueInteger(0, 15, temp_val)
         radio_setting = RadioSetting(name, "DAC gain", val)
         radio_setting_group.append(radio_setting)
 
-################## LAYOUT
-
-        basic.append(squelch_setting)
-        basic.append(rx_mode_setting)
-        basic.append(call_channel_setting)
-        basic.append(auto_keypad_lock_setting)
-        basic.append(tx_t_out_setting)
-        basic.append(bat_save_setting)
-        basic.append(scn_rev_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_NOAA:
-            basic.append(noaa_auto_scan_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_AM_FIX:
-            basic.append(am_fix_setting)
-
-        append_label(basic,
-                     "=" * 6 + " Display settings " + "=" * 300, "=" * 300)
-
-        basic.append(bat_txt_setting)
-        basic.append(mic_bar_setting)
-        basic.append(ch_disp_setting)
-        basic.append(p_on_msg_setting)
-        basic.append(logo1_setting)
-        basic.append(logo2_setting)
-
-        append_label(basic,
-                     "=" * 6 + " Backlight settings " + "=" * 300, "=" * 300)
-
-        basic.append(back_lt_setting)
-        basic.append(bl_min_setting)
-        basic.append(bl_max_setting)
-        basic.append(blt_trx_setting)
-
-        append_label(basic,
-                    "=" * 6 + " Audio related settings " + "=" * 300, "=" * 300)
-
-        if _mem.BUILD_OPTIONS.ENABLE_VOX:
-            basic.append(vox_setting)
-        basic.append(mic_gain_setting)
-        basic.append(beep_setting)
-        basic.append(roger_setting)
-        basic.append(ste_setting)
-        basic.append(rp_ste_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_VOICE:
-            basic.append(voice_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_ALARM:
-            basic.append(alarm_setting)
-
-        append_label(basic, "=" * 6 + " Radio state " + "=" * 300, "=" * 300)
-
-        basic.append(freq0_setting)
-        basic.append(freq1_setting)
-        basic.append(tx_vfo_setting)
-        basic.append(keypad_cock_setting)
-
-        advanced.append(freq_mode_allowed_setting)
-        advanced.append(bat_type_setting)
-        advanced.append(s0_level_setting)
-        advanced.append(s9_level_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_PWRON_PASSWORD:
-            advanced.append(pswd_setting)
-
-        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
-            dtmf.append(sep_code_setting)
-            dtmf.append(group_code_setting)
-        dtmf.append(first_code_per_setting)
-        dtmf.append(spec_per_setting)
-        dtmf.append(code_per_setting)
-        dtmf.append(code_int_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
-            dtmf.append(ani_id_setting)
-        dtmf.append(up_code_setting)
-        dtmf.append(dw_code_setting)
-        dtmf.append(d_prel_setting)
-        dtmf.append(dtmf_side_tone_setting)
-        if _mem.BUILD_OPTIONS.ENABLE_DTMF_CALLING:
-            dtmf.append(dtmf_resp_setting)
-            dtmf.append(d_hold_setting)
-            dtmf.append(d_live_setting)
-            dtmf.append(perm_kill_setting)
-            dtmf.append(kill_code_setting)
-            dtmf.append(rev_code_setting)
-            dtmf.append(killed_setting)
-
-        unlock.append(f_lock_setting)
-        unlock.append(tx200_setting)
-        unlock.append(tx350_setting)
-        unlock.append(tx500_setting)
-        unlock.append(en350_setting)
-        unlock.append(en_scrambler_setting)
-
-        return top
-
     def set_memory(self, memory):
         """
         Store details about a high-level memory to the memory map
@@ -2387,7 +3436,7 @@ class UVK5Radio(chirp_common.CloneModeRadio):
         band = self._find_band(memory.freq)
 
         # mode
-        tmp_mode = self.get_features().valid_modes.index(memory.mode)
+        tmp_mode = MODES_LIST.index(memory.mode)
         _mem.modulation = tmp_mode / 2
         _mem.bandwidth = tmp_mode % 2
         if memory.mode == "USB":
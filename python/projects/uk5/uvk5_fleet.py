@@ -0,0 +1,134 @@
+# Program many Quansheng UV-K5/K6 radios with the same image at once
+#
+# Every serial port gets its own thread running the egzumer driver's
+# do_download/do_upload, so the total time is about that of the slowest
+# radio instead of the sum of all of them. The calibration area is factory
+# data of each radio and is never written from here.
+#
+#   python uvk5_fleet.py codeplug.img /dev/ttyUSB0 /dev/ttyUSB1 /dev/ttyUSB2
+#   python uvk5_fleet.py codeplug.img COM3 COM4 --incremental --retries 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+
+from chirp import errors, memmap
+
+from uvk5_egzumer import UVK5Radio, do_download, do_upload
+
+
+class FleetJob:
+    """state of one radio being programmed"""
+
+    def __init__(self, port):
+        self.port = port
+        self.phase = "waiting"
+        self.percent = 0
+        self.attempts = 0
+        self.firmware = ""
+        self.result = ""
+        self.seconds = 0.0
+
+
+def program_radio(job, image, args):
+    """upload image to the radio on job.port, retrying on radio errors"""
+    start = time.monotonic()
+
+    def status_fn(status):
+        if status.max:
+            job.percent = int(status.cur * 100 / status.max)
+
+    while job.attempts <= args.retries:
+        job.attempts += 1
+        try:
+            with serial.Serial(job.port, UVK5Radio.BAUD_RATE,
+                               timeout=0.5) as pipe:
+                radio = UVK5Radio(memmap.MemoryMapBytes(image))
+                radio.pipe = pipe
+                radio.status_fn = status_fn
+                radio.upload_incremental = args.incremental
+                radio.upload_verify = args.verify
+
+                if args.incremental:
+                    # learn what the radio holds so only changes are sent
+                    job.phase = "download"
+                    do_download(radio)
+
+                job.phase = "upload"
+                do_upload(radio)
+                job.firmware = radio.FIRMWARE_VERSION
+            job.result = "OK"
+            break
+        except (errors.RadioError, serial.SerialException) as e:
+            job.result = f"FAILED: {e}"
+            if job.attempts <= args.retries:
+                job.phase = "retry"
+                time.sleep(1)
+
+    job.phase = "done"
+    job.seconds = time.monotonic() - start
+    return job
+
+
+def _print_progress(jobs):
+    line = "  ".join(f"{job.port}:{job.phase[:4]} {job.percent:3d}%"
+                     for job in jobs)
+    sys.stdout.write("\r" + line)
+    sys.stdout.flush()
+
+
+def _print_summary(jobs, elapsed):
+    print("\n")
+    print(f"{'Port':<16} {'Result':<30} {'Tries':>5} {'Time':>7}  Firmware")
+    print("-" * 72)
+    for job in jobs:
+        print(f"{job.port:<16} {job.result[:30]:<30} {job.attempts:>5} "
+              f"{job.seconds:>6.1f}s  {job.firmware}")
+    failed = sum(1 for job in jobs if job.result != "OK")
+    print("-" * 72)
+    print(f"{len(jobs) - failed} programmed, {failed} failed "
+          f"in {elapsed:.1f}s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Upload one image to many UV-K5 radios concurrently")
+    parser.add_argument("image", help="CHIRP .img file to upload")
+    parser.add_argument("ports", nargs="+", help="serial ports, one per radio")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="retries per radio after a failure")
+    parser.add_argument("--incremental", action="store_true",
+                        help="download first and only upload changed blocks")
+    parser.add_argument("--verify", action="store_true",
+                        help="read the upload back and rewrite bad blocks")
+    args = parser.parse_args()
+
+    # load the image once, CHIRP strips its metadata trailer
+    image = UVK5Radio(args.image).get_mmap().get_packed()
+
+    jobs = [FleetJob(port) for port in args.ports]
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(program_radio, job, image, args)
+                   for job in jobs]
+        while not all(future.done() for future in futures):
+            _print_progress(jobs)
+            time.sleep(0.5)
+        _print_progress(jobs)
+
+    failed = _print_summary(jobs, time.monotonic() - start)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
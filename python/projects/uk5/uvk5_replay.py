@@ -0,0 +1,298 @@
+# Record and replay UV-K5 serial sessions
+#
+# RecordingPipe wraps the serial port given to the egzumer driver and logs
+# every write and read with a timestamp to a small binary file. ReplayPipe
+# plays such a log back to do_download/do_upload without a radio, either
+# as fast as possible or with the timing of the original session, and
+# checks that the driver sends exactly the bytes that were recorded.
+#
+#   python uvk5_replay.py record /dev/ttyUSB0 session.uvkrec saved.img
+#   python uvk5_replay.py replay session.uvkrec --runs 5 --realtime
+#   python uvk5_replay.py replay upload.uvkrec --upload saved.img
+#   python uvk5_replay.py dump session.uvkrec
+#
+# In CHIRP or a script, wrap the port before talking to the radio:
+#
+#   radio.pipe = RecordingPipe(radio.pipe, "session.uvkrec")
+#
+# Log format: MAGIC, then one record per event, REC_HEADER (kind,
+# seconds since the start of the session, length) followed by the data.
+# Kinds are b"W" (written), b"R" (read) and b"F" (input buffer flushed).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import argparse
+import struct
+import time
+
+import serial
+
+from chirp import memmap
+
+from uvk5_egzumer import UVK5Radio, do_download, do_upload, xorarr
+
+MAGIC = b"UVK5REC1"
+REC_HEADER = struct.Struct("<cdI")
+
+WRITE = b"W"
+READ = b"R"
+FLUSH = b"F"
+
+
+class ReplayError(Exception):
+    """the driver did something the recorded session did not"""
+
+
+def read_log(path):
+    """the records of a session log as a list of (kind, seconds, data)"""
+    with open(path, "rb") as logfile:
+        data = logfile.read()
+    if not data.startswith(MAGIC):
+        raise ReplayError(f"{path} is not a UV-K5 session log")
+
+    records = []
+    pos = len(MAGIC)
+    while pos < len(data):
+        kind, stamp, length = REC_HEADER.unpack_from(data, pos)
+        pos += REC_HEADER.size
+        records.append((kind, stamp, data[pos:pos+length]))
+        pos += length
+    return records
+
+
+class RecordingPipe:
+    """serial port wrapper logging all traffic to path"""
+
+    def __init__(self, serport, path):
+        self.serport = serport
+        self._log = open(path, "wb")
+        self._log.write(MAGIC)
+        self._start = time.perf_counter()
+
+    def _record(self, kind, data):
+        stamp = time.perf_counter() - self._start
+        self._log.write(REC_HEADER.pack(kind, stamp, len(data)))
+        self._log.write(data)
+
+    def write(self, data):
+        self._record(WRITE, data)
+        return self.serport.write(data)
+
+    def read(self, size=1):
+        data = self.serport.read(size)
+        self._record(READ, data)
+        return data
+
+    def reset_input_buffer(self):
+        self._record(FLUSH, b"")
+        self.serport.reset_input_buffer()
+
+    def close(self):
+        self._log.close()
+        self.serport.close()
+
+    @property
+    def timeout(self):
+        return self.serport.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.serport.timeout = value
+
+    def __getattr__(self, name):
+        return getattr(self.serport, name)
+
+
+class ReplayPipe:
+    """
+    pyserial-like port answering from a recorded session. What was read
+    after a write becomes readable once the driver makes the same write;
+    with realtime the bytes arrive with their recorded delays, otherwise
+    at once. strict checks every write against the recording
+    """
+
+    def __init__(self, records, realtime=False, strict=True):
+        if isinstance(records, str):
+            records = read_log(records)
+        self.records = records
+        self.realtime = realtime
+        self.strict = strict
+        self.timeout = None
+        self.port = "replay"
+
+        self._pos = 0
+        self._rx = bytearray()
+        # bytes still on their way: [ready_time, data]
+        self._arriving = []
+        self.writes = 0
+
+    def _next(self, kind):
+        while self._pos < len(self.records):
+            record = self.records[self._pos]
+            self._pos += 1
+            if record[0] == kind:
+                return record
+        return None
+
+    def write(self, data):
+        now = time.perf_counter()
+        record = self._next(WRITE)
+        if record is None:
+            raise ReplayError("write past the end of the recorded session")
+        if self.strict and record[2] != data:
+            raise ReplayError(f"write {self.writes} differs from the "
+                              f"recording: {data.hex()} != {record[2].hex()}")
+        self.writes += 1
+
+        # replies up to the next write, relative to this one
+        sent = record[1]
+        while self._pos < len(self.records) and \
+                self.records[self._pos][0] != WRITE:
+            kind, stamp, chunk = self.records[self._pos]
+            self._pos += 1
+            if kind == READ and chunk:
+                ready = now + (stamp - sent if self.realtime else 0.0)
+                self._arriving.append([ready, chunk])
+        return len(data)
+
+    def _collect(self, now):
+        while self._arriving and self._arriving[0][0] <= now:
+            self._rx += self._arriving.pop(0)[1]
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        while True:
+            now = time.perf_counter()
+            self._collect(now)
+            if len(self._rx) >= size or not self._arriving or \
+                    not self.realtime:
+                break
+            wake = min(self._arriving[0][0], deadline)
+            if wake <= now:
+                break
+            time.sleep(wake - now)
+
+        data = bytes(self._rx[:size])
+        del self._rx[:size]
+        return data
+
+    def reset_input_buffer(self):
+        self._collect(time.perf_counter())
+        self._rx.clear()
+
+    def close(self):
+        pass
+
+
+def _frames(stream):
+    """split a byte stream into (offset, payload) of the frames in it"""
+    pos = 0
+    while True:
+        pos = stream.find(b"\xab\xcd", pos)
+        if pos < 0 or pos + 4 > len(stream):
+            return
+        length = stream[pos+2]
+        end = pos + 4 + length + 4
+        if end > len(stream):
+            return
+        yield pos, xorarr(stream[pos+4:pos+4+length])
+        pos = end
+
+
+def dump(args):
+    """print the commands and replies of a session, deobfuscated"""
+    streams = {WRITE: bytearray(), READ: bytearray()}
+    stamps = {WRITE: [], READ: []}
+    events = []
+    for kind, stamp, data in read_log(args.log):
+        if kind == FLUSH:
+            events.append((stamp, " -- input flushed"))
+        elif kind in streams:
+            stamps[kind].extend([stamp] * len(data))
+            streams[kind] += data
+
+    for kind, arrow in ((WRITE, ">"), (READ, "<")):
+        for pos, payload in _frames(bytes(streams[kind])):
+            # a frame is complete when its last byte went through
+            end = min(pos + len(payload) + 7, len(stamps[kind]) - 1)
+            cmd = struct.unpack_from("<H", payload)[0] \
+                if len(payload) > 1 else 0
+            events.append((stamps[kind][end],
+                           f"{arrow} 0x{cmd:04x} {payload[2:].hex()}"))
+
+    for stamp, text in sorted(events, key=lambda ev: ev[0]):
+        print(f"{stamp*1000:10.1f} ms {text}")
+
+
+def record(args):
+    """download from a radio while recording the session"""
+    with serial.Serial(args.port, UVK5Radio.BAUD_RATE, timeout=0.5) as port:
+        pipe = RecordingPipe(port, args.log)
+        radio = UVK5Radio(pipe)
+        try:
+            radio.sync_in()
+        finally:
+            pipe.close()
+    radio.save_mmap(args.image)
+    print(f"recorded {len(read_log(args.log))} events to {args.log}")
+
+
+def replay(args):
+    """run do_download (or do_upload) against a recorded session"""
+    records = read_log(args.log)
+    image = None
+    if args.upload:
+        image = UVK5Radio(args.upload).get_mmap().get_packed()
+
+    for run in range(args.runs):
+        pipe = ReplayPipe(records, realtime=args.realtime)
+        if image is None:
+            radio = UVK5Radio(pipe)
+        else:
+            radio = UVK5Radio(memmap.MemoryMapBytes(image))
+            radio.pipe = pipe
+        radio.download_resume = False
+
+        start = time.perf_counter()
+        if image is None:
+            do_download(radio)
+        else:
+            do_upload(radio)
+        elapsed = time.perf_counter() - start
+        print(f"run {run}: {pipe.writes} commands in {elapsed*1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record and replay UV-K5 serial sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="download a radio, recording it")
+    rec.add_argument("port")
+    rec.add_argument("log", help="session log to write")
+    rec.add_argument("image", help=".img file to save the download to")
+    rec.set_defaults(func=record)
+
+    rep = sub.add_parser("replay", help="replay a session to the driver")
+    rep.add_argument("log")
+    rep.add_argument("--upload", metavar="IMAGE",
+                     help="the session is an upload of this .img file")
+    rep.add_argument("--realtime", action="store_true",
+                     help="keep the recorded reply delays")
+    rep.add_argument("--runs", type=int, default=1)
+    rep.set_defaults(func=replay)
+
+    dmp = sub.add_parser("dump", help="print the frames of a session")
+    dmp.add_argument("log")
+    dmp.set_defaults(func=dump)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Simulated Quansheng UV-K5 for running uvk5_egzumer.py without a radio
+#
+# SimulatedRadio looks like a pyserial port to the driver. It decodes the
+# frames written to it (0xABCD header, XOR obfuscation, CRC, 0xDCBA footer),
+# answers hello, readmem, writemem and reset against an in-memory EEPROM
+# and queues the replies with a configurable latency and line speed.
+# Lost, corrupted and reordered replies can be injected to exercise the
+# driver's error paths.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import random
+import struct
+import time
+
+from uvk5_egzumer import xorarr, calculate_crc16_xmodem, MEM_SIZE
+
+CMD_HELLO = 0x0514
+CMD_HELLO_REPLY = 0x0515
+CMD_READMEM = 0x051B
+CMD_READMEM_REPLY = 0x051C
+CMD_WRITEMEM = 0x051D
+CMD_WRITEMEM_REPLY = 0x051E
+CMD_RESET = 0x05DD
+
+
+class SimulatedRadio:
+    """pyserial-like stand-in for a UV-K5 on the end of a programming cable
+
+    latency is the time the radio needs to answer a command, baudrate
+    throttles both directions of the line (None for an infinitely fast
+    line). drop_rate, corrupt_rate and reorder_rate are the probabilities
+    of a reply being lost, mangled or swapped with the next one.
+    """
+
+    def __init__(self, eeprom=None, firmware="k5sim 1.0", latency=0.0,
+                 baudrate=38400, drop_rate=0.0, corrupt_rate=0.0,
+                 reorder_rate=0.0, seed=None):
+        if eeprom is None:
+            eeprom = b"\xff" * MEM_SIZE
+        self.eeprom = bytearray(eeprom)
+        self.firmware = firmware
+        self.latency = latency
+        self.baudrate = baudrate
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.reorder_rate = reorder_rate
+        self.timeout = None
+        self.port = "sim"
+
+        self._rng = random.Random(seed)
+        self._rx = bytearray()
+        # queued replies: [ready_time, frame, command_time]
+        self._replies = []
+        self._out = bytearray()
+        self._out_sent = []
+        self._busy_until = 0.0
+
+        self.commands = 0
+        self.bad_frames = 0
+        self.resets = 0
+        self.round_trips = []
+
+    def _line_time(self, nbytes):
+        if not self.baudrate:
+            return 0.0
+        return nbytes * 10.0 / self.baudrate
+
+    # pyserial interface
+
+    def write(self, data):
+        now = time.monotonic()
+        self._rx += data
+        arrival = now + self._line_time(len(data))
+        while self._handle_frame(now, arrival):
+            pass
+        return len(data)
+
+    def read(self, size=1):
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+        while len(self._out) < size:
+            now = time.monotonic()
+            self._collect(now)
+            if len(self._out) >= size:
+                break
+            if not self._replies:
+                # nothing on its way, a real port waits out the timeout
+                if deadline is not None:
+                    time.sleep(max(0.0, deadline - now))
+                break
+            wake = self._replies[0][0]
+            if deadline is not None and wake > deadline:
+                time.sleep(max(0.0, deadline - now))
+                self._collect(time.monotonic())
+                break
+            time.sleep(max(0.0, wake - now))
+
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        self._account(len(data))
+        return data
+
+    def reset_input_buffer(self):
+        self._collect(time.monotonic())
+        self._account(len(self._out))
+        self._out.clear()
+
+    def close(self):
+        pass
+
+    # line model
+
+    def _collect(self, now):
+        while self._replies and self._replies[0][0] <= now:
+            _, frame, sent = self._replies.pop(0)
+            self._out += frame
+            self._out_sent.append((len(frame), sent))
+
+    def _account(self, nbytes):
+        """record the round trip time of every reply the host has consumed"""
+        while nbytes and self._out_sent:
+            left, sent = self._out_sent[0]
+            used = min(left, nbytes)
+            nbytes -= used
+            if used == left:
+                self._out_sent.pop(0)
+                self.round_trips.append(time.monotonic() - sent)
+            else:
+                self._out_sent[0] = (left - used, sent)
+
+    def _queue_reply(self, payload, sent, arrival):
+        rnd = self._rng.random
+        if rnd() < self.drop_rate:
+            return
+
+        frame = bytearray(struct.pack(">HBB", 0xabcd, len(payload), 0))
+        frame += xorarr(payload + b"\xff\xff")
+        frame += struct.pack(">H", 0xdcba)
+        if rnd() < self.corrupt_rate:
+            frame[self._rng.choice((0, 1, -2, -1))] ^= 0xff
+
+        start = max(arrival, self._busy_until) + self.latency
+        ready = start + self._line_time(len(frame))
+        self._busy_until = ready
+        entry = [ready, bytes(frame), sent]
+
+        if self._replies and rnd() < self.reorder_rate:
+            entry[0], self._replies[-1][0] = self._replies[-1][0], entry[0]
+            self._replies.insert(len(self._replies) - 1, entry)
+        else:
+            self._replies.append(entry)
+
+    # radio side
+
+    def _handle_frame(self, sent, arrival):
+        """decode one frame from the receive buffer, False if none is left"""
+        start = self._rx.find(b"\xab\xcd")
+        if start < 0:
+            self._rx.clear()
+            return False
+        del self._rx[:start]
+        if len(self._rx) < 4:
+            return False
+        length = self._rx[2]
+        total = 4 + length + 2 + 2
+        if len(self._rx) < total:
+            return False
+        frame = bytes(self._rx[:total])
+        del self._rx[:total]
+
+        body = xorarr(frame[4:4+length+2])
+        data, crc = body[:length], struct.unpack("<H", body[length:])[0]
+        if frame[-2:] != b"\xdc\xba" or \
+                crc != calculate_crc16_xmodem(data) or length < 4:
+            self.bad_frames += 1
+            return True
+
+        self.commands += 1
+        cmd = struct.unpack("<H", data[0:2])[0]
+        reply = self._execute(cmd, data)
+        if reply is not None:
+            self._queue_reply(reply, sent, arrival)
+        return True
+
+    def _execute(self, cmd, data):
+        if cmd == CMD_HELLO:
+            version = self.firmware.encode("ascii")[:15].ljust(16, b"\x00")
+            return struct.pack("<HH", CMD_HELLO_REPLY, 20) + version + \
+                b"\x00" * 4
+
+        if cmd == CMD_READMEM:
+            offset, length = struct.unpack("<HB", data[4:7])
+            mem = bytes(self.eeprom[offset:offset+length])
+            return struct.pack("<HHHBB", CMD_READMEM_REPLY, 4 + len(mem),
+                               offset, len(mem), 0) + mem
+
+        if cmd == CMD_WRITEMEM:
+            offset, length = struct.unpack("<HB", data[4:7])
+            mem = data[12:12+length]
+            self.eeprom[offset:offset+len(mem)] = mem
+            return struct.pack("<HHH", CMD_WRITEMEM_REPLY, 2, offset)
+
+        if cmd == CMD_RESET:
+            self.resets += 1
+            return None
+
+        self.bad_frames += 1
+        return None
@@ -0,0 +1,214 @@
+# Content-addressed store for Quansheng UV-K5 (egzumer) images
+#
+# Every image added is split into MEM_BLOCK sized blocks which are stored
+# once per distinct content, keyed by their hash. A snapshot is only the
+# list of its block hashes plus the radio it came from, so keeping every
+# download of a whole fleet costs little more than the blocks that really
+# changed. Two snapshots are compared by their hash lists and any of them
+# can be turned back into an image.
+#
+#   python uvk5_snapshots.py fleet.db add radio-07 radio-07.img
+#   python uvk5_snapshots.py fleet.db log radio-07
+#   python uvk5_snapshots.py fleet.db diff 12 31
+#   python uvk5_snapshots.py fleet.db restore 12 radio-07-old.img
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+
+
+import argparse
+import hashlib
+import sqlite3
+import time
+
+from chirp import memmap
+
+from uvk5_egzumer import UVK5Radio, MEM_BLOCK, MEM_SIZE
+
+HASH_SIZE = 16  # bytes of blake2b per block
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    hash BLOB PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    radio TEXT NOT NULL,
+    taken REAL NOT NULL,
+    firmware TEXT NOT NULL,
+    note TEXT NOT NULL,
+    refs BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_radio ON snapshots (radio, taken);
+"""
+
+
+def block_hashes(image):
+    """the hash of every MEM_BLOCK sized block of image"""
+    return [hashlib.blake2b(image[addr:addr+MEM_BLOCK],
+                            digest_size=HASH_SIZE).digest()
+            for addr in range(0, len(image), MEM_BLOCK)]
+
+
+def changed_blocks(old_hashes, new_hashes):
+    """addresses of the blocks that differ between two hash lists"""
+    return [idx * MEM_BLOCK
+            for idx, (old, new) in enumerate(zip(old_hashes, new_hashes))
+            if old != new]
+
+
+class SnapshotStore:
+    """images of many radios over time, stored as deduplicated blocks"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def add(self, radio, image, firmware="", note=""):
+        """store image as the newest snapshot of radio, returns its id"""
+        if len(image) != MEM_SIZE:
+            raise ValueError(f"image is {len(image)} bytes, not {MEM_SIZE}")
+        hashes = block_hashes(image)
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO blocks (hash, data) VALUES (?, ?)",
+                ((digest, image[idx*MEM_BLOCK:(idx+1)*MEM_BLOCK])
+                 for idx, digest in enumerate(hashes)))
+            cur = self.db.execute(
+                "INSERT INTO snapshots (radio, taken, firmware, note, refs) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (radio, time.time(), firmware, note, b"".join(hashes)))
+        return cur.lastrowid
+
+    def add_radio(self, radio_id, radio, note=""):
+        """store the image of a UVK5Radio, e.g. right after a download"""
+        return self.add(radio_id, radio.get_mmap().get_packed(),
+                        radio.FIRMWARE_VERSION, note)
+
+    def radios(self):
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT radio FROM snapshots ORDER BY radio")]
+
+    def history(self, radio):
+        """(id, taken, firmware, note) of every snapshot of radio"""
+        return self.db.execute(
+            "SELECT id, taken, firmware, note FROM snapshots "
+            "WHERE radio = ? ORDER BY taken, id", (radio,)).fetchall()
+
+    def latest(self, radio):
+        """id of the newest snapshot of radio, None if there is none"""
+        row = self.db.execute(
+            "SELECT id FROM snapshots WHERE radio = ? "
+            "ORDER BY taken DESC, id DESC LIMIT 1", (radio,)).fetchone()
+        return row[0] if row else None
+
+    def hashes(self, snapshot):
+        """the block hashes of a snapshot"""
+        row = self.db.execute("SELECT refs FROM snapshots WHERE id = ?",
+                              (snapshot,)).fetchone()
+        if row is None:
+            raise KeyError(f"no snapshot {snapshot}")
+        refs = row[0]
+        return [refs[pos:pos+HASH_SIZE]
+                for pos in range(0, len(refs), HASH_SIZE)]
+
+    def image(self, snapshot):
+        """restore the image of a snapshot"""
+        hashes = self.hashes(snapshot)
+        blocks = dict(self.db.execute(
+            "SELECT hash, data FROM blocks WHERE hash IN (%s)" %
+            ",".join("?" * len(set(hashes))), list(set(hashes))))
+        return b"".join(blocks[digest] for digest in hashes)
+
+    def diff(self, old, new):
+        """addresses of the blocks that differ between two snapshots"""
+        return changed_blocks(self.hashes(old), self.hashes(new))
+
+    def diff_image(self, snapshot, image):
+        """
+        addresses of the blocks of image that differ from a snapshot, the
+        blocks an upload of image to that radio has to write
+        """
+        return changed_blocks(self.hashes(snapshot), block_hashes(image))
+
+    def stats(self):
+        """number of snapshots and of distinct blocks stored"""
+        snapshots = self.db.execute(
+            "SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        blocks = self.db.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        return snapshots, blocks
+
+
+def _load_image(path):
+    return UVK5Radio(path).get_mmap().get_packed()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deduplicated history of UV-K5 images")
+    parser.add_argument("db", help="snapshot database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="store an .img as a radio's snapshot")
+    add.add_argument("radio")
+    add.add_argument("image")
+    add.add_argument("--note", default="")
+
+    log = sub.add_parser("log", help="list the snapshots of a radio")
+    log.add_argument("radio", nargs="?")
+
+    diff = sub.add_parser("diff", help="blocks changed between snapshots")
+    diff.add_argument("old", type=int)
+    diff.add_argument("new", type=int)
+
+    restore = sub.add_parser("restore", help="write a snapshot as .img")
+    restore.add_argument("snapshot", type=int)
+    restore.add_argument("image")
+
+    args = parser.parse_args()
+    with SnapshotStore(args.db) as store:
+        if args.command == "add":
+            snap = store.add(args.radio, _load_image(args.image),
+                             note=args.note)
+            history = store.history(args.radio)
+            if len(history) > 1:
+                changed = store.diff(history[-2][0], snap)
+                print(f"snapshot {snap}, {len(changed)} blocks changed")
+            else:
+                print(f"snapshot {snap}")
+
+        elif args.command == "log":
+            radios = [args.radio] if args.radio else store.radios()
+            for radio in radios:
+                for snap, taken, firmware, note in store.history(radio):
+                    stamp = time.strftime("%Y-%m-%d %H:%M:%S",
+                                          time.localtime(taken))
+                    print(f"{snap:6d} {radio:<16} {stamp} {firmware:<16} "
+                          f"{note}")
+            snapshots, blocks = store.stats()
+            print(f"{snapshots} snapshots in {blocks * MEM_BLOCK} bytes "
+                  f"of blocks ({snapshots * MEM_SIZE} as full images)")
+
+        elif args.command == "diff":
+            for addr in store.diff(args.old, args.new):
+                print(f"0x{addr:04x}")
+
+        elif args.command == "restore":
+            image = store.image(args.snapshot)
+            UVK5Radio(memmap.MemoryMapBytes(image)).save_mmap(args.image)
+
+
+if __name__ == "__main__":
+    main()